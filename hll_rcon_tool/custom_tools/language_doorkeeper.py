@@ -9,29 +9,1782 @@ Source : https://github.com/ElGuillermo
 Feel free to use/modify/distribute, as long as you keep this note in your code
 """
 
+import functools
+import heapq
+import importlib
+import itertools
+import atexit
+import concurrent.futures
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import signal
+import string
+import sys
+import threading
+import uuid
+from collections import Counter, deque
 from datetime import datetime, timezone, timedelta
 from multiprocessing.pool import ThreadPool
 import random
 import re
+import time
 from time import sleep
-from typing import Literal, List
+from types import MappingProxyType
+from typing import Literal, List, Optional
 import discord
 from rcon.blacklist import add_record_to_blacklist
 from rcon.game_logs import get_recent_logs
-from rcon.player_history import add_flag_to_player
+from rcon.player_history import add_flag_to_player, get_player_profile
 from rcon.rcon import Rcon
 from rcon.settings import SERVER_INFO
 from rcon.utils import get_server_number
-import custom_tools.language_doorkeeper_config as config
+import custom_tools.language_doorkeeper_config as config_module
 import custom_tools.common_functions as common_functions
+from custom_tools.language_doorkeeper_backfill import (
+    load_verified_index, verified_index_path, write_flags
+)
+from custom_tools.language_doorkeeper_ha import FileLease, LeaderElector, RedisLease
+from custom_tools.language_doorkeeper_outcomes import OutcomeStore, outcomes_file_path
+from custom_tools.language_doorkeeper_profiling import Profiler
+from custom_tools.language_doorkeeper_shared_ids import SharedIdSet, shared_ids_file_path
+from custom_tools.language_doorkeeper_steam import SteamCountryResolver
 from custom_tools.common_translations import TRANSL
 
 
+# Compiled configuration
+# -----------------------------------------------------------------------------
+
+# Texts longer than this may be cut or refused by the game server
+MESSAGE_LENGTH_WARNING = 500
+
+# Number of previous tests used to estimate a test duration
+CHALLENGE_STATS_HISTORY = 200
+
+# Interval (seconds) between two checks for a map change during a batch
+MATCH_END_CHECK_SECS = 5
+
+# Interval (seconds) between two checks of the config file modification time
+CONFIG_RELOAD_CHECK_SECS = 5
+
+
+class ConfigError(Exception):
+    """
+    The configuration file contains an invalid value
+    """
+
+
+class CompiledConfig:
+    """
+    Immutable, validated snapshot of language_doorkeeper_config
+    """
+    def __init__(self, values: dict):
+        object.__setattr__(self, "_values", MappingProxyType(values))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The configuration is read-only")
+
+
+class _ConfigProxy:
+    """
+    Gives access to the configuration snapshot in use.
+    A challenge keeps the snapshot it has been started with,
+    so a reload never changes the rules in the middle of a test.
+    """
+    def __getattr__(self, name):
+        snapshot = getattr(_context, "config", None) or _current_config
+        return getattr(snapshot, name)
+
+
+def _freeze(value):
+    """
+    Converts mutable containers to their immutable counterpart
+    """
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+
+def _parse_duration(name: str, value: Optional[str]) -> Optional[timedelta]:
+    """
+    Converts a "hours=2" or "days=7" config value to a timedelta
+    """
+    if value is None:
+        return None
+    try:
+        return timedelta(**{
+            unit.strip(): float(amount)
+            for unit, amount in (part.split("=") for part in value.split(","))
+        })
+    except (AttributeError, TypeError, ValueError) as error:
+        raise ConfigError(f"{name} is invalid ('hours=2', 'days=7', ...) - {error}") from error
+
+
+def compile_config(module) -> CompiledConfig:
+    """
+    Validates the configuration module values
+    and precompiles them into an immutable snapshot.
+    Raises ConfigError if a value is invalid.
+    """
+    values = {
+        name: _freeze(value)
+        for name, value in vars(module).items()
+        if name.isupper()
+    }
+
+    def check(condition: bool, message: str):
+        if not condition:
+            raise ConfigError(message)
+
+    for name in (
+        "WATCH_INTERVAL_SECS", "TIME_TO_ANSWER_SEC", "MAX_PLAYERS_TO_CHECK",
+        "WRITE_QUEUE_FLUSH_INTERVAL_SECS", "WRITE_QUEUE_MAX_ATTEMPTS", "RCON_CALLS_BURST",
+        "CIRCUIT_BREAKER_FAILURES", "PUNISH_READINESS_POLL_SECS", "PREFETCH_POLL_SECS",
+        "SHARED_IDS_CAPACITY", "STEAM_COUNTRY_CACHE_HOURS", "PROFILING_CPU_SECS",
+        "PROFILING_SAMPLE_MS", "DISCORD_DIGEST_INTERVAL_MINS", "DISCORD_DIGEST_MAX_EVENTS",
+        "BACKEND_CALL_TIMEOUT_SECS", "HA_LEASE_SECS", "BROADCAST_MIN_PLAYERS",
+        "BROADCAST_MAX_PLAYERS"
+    ):
+        check(
+            isinstance(values.get(name), int) and values[name] > 0,
+            f"{name} must be a positive integer"
+        )
+    for name in (
+        "DONT_KICK_BELOW", "WHITELIST_VIP_HOURS", "MAX_PUNISH_RETRIES", "PUNISH_RETRIES_INTERVAL",
+        "RCON_CALLS_PER_SEC", "CIRCUIT_BREAKER_COOLDOWN_SECS", "PUNISH_READINESS_RESPAWN_SECS",
+        "REJOIN_MEMORY_HOURS", "REJOIN_TIME_TO_ANSWER_SEC", "REJOIN_BLACKLIST_AFTER",
+        "EARLY_KICK_WRONG_ANSWERS", "EARLY_REPROMPTS", "EARLY_KICK_MIN_SECS",
+        "SEEDING_PLAYERS_TO_CHECK", "CHALLENGE_TIMEOUT_SECS", "TRUST_EXEMPT_SCORE"
+    ):
+        check(
+            isinstance(values.get(name), int) and values[name] >= 0,
+            f"{name} must be a positive integer or 0"
+        )
+    check(values.get("LANG") in (0, 1, 2, 3), "LANG must be 0, 1, 2 or 3")
+    check(
+        values.get("HA_LEASE_BACKEND") in ("file", "redis"),
+        "HA_LEASE_BACKEND must be 'file' or 'redis'"
+    )
+    check(
+        values.get("TK_ACTION") in ("blacklist", "kickonly"),
+        "TK_ACTION must be 'blacklist' or 'kickonly'"
+    )
+    check(
+        values.get("QUESTION_DELIVERY") in ("punish", "message"),
+        "QUESTION_DELIVERY must be 'punish' or 'message'"
+    )
+
+    # Activity schedule
+    schedule = values.get("SCHEDULE", {})
+    check(sorted(schedule) == list(range(7)), "SCHEDULE must define the 7 days (0-6)")
+    for day, hours in schedule.items():
+        check(
+            len(hours) == 4
+            and 0 <= hours[0] <= 23 and 0 <= hours[1] <= 59
+            and 0 <= hours[2] <= 23 and 0 <= hours[3] <= 59,
+            f"SCHEDULE day {day} must be (start_hour, start_minute, end_hour, end_minute)"
+        )
+
+    # Question
+    words_lists = (
+        "FIRST_WORDS_LIST", "SECOND_WORDS_LIST", "THIRD_WORDS_LIST", "FOURTH_WORDS_LIST"
+    )
+    for name in words_lists:
+        check(len(values.get(name, ())) > 0, f"{name} can't be empty")
+    placeholders = [
+        field for _, field, _, _ in string.Formatter().parse(values["GENERIC_QUESTION"])
+        if field is not None
+    ]
+    check(
+        placeholders == [""] * 4,
+        "GENERIC_QUESTION must contain exactly four {} placeholders"
+    )
+
+    # Answers
+    flags = 0 if values["ANSWER_CASE_SENSITIVE"] else re.IGNORECASE
+    values["ANSWER_PATTERNS"] = MappingProxyType({
+        word: re.compile(re.escape(word), flags) for word in values["FIRST_WORDS_LIST"]
+    })
+
+    # Whitelists
+    try:
+        values["WHITELIST_PSEUDO_PATTERN"] = re.compile(
+            values["WHITELIST_PSEUDO_REGEX"], re.IGNORECASE
+        )
+    except re.error as error:
+        raise ConfigError(f"WHITELIST_PSEUDO_REGEX is invalid - {error}") from error
+    if values["VERIFIED_PLAYER_FLAG"] not in values["WHITELIST_CRCON_EMOJI_FLAGS"]:
+        logger.warning(
+            "VERIFIED_PLAYER_FLAG (%s) is not in WHITELIST_CRCON_EMOJI_FLAGS : "
+            "verified players will be tested again",
+            values["VERIFIED_PLAYER_FLAG"]
+        )
+
+    # Blacklists durations ("hours=2", "days=7", ...)
+    values["TK_BLACKLIST_DURATION"] = _parse_duration(
+        "TK_BLACKLIST_EXPIRATION", values.get("TK_BLACKLIST_EXPIRATION")
+    )
+    values["REJOIN_BLACKLIST_DURATION"] = _parse_duration(
+        "REJOIN_BLACKLIST_EXPIRATION", values.get("REJOIN_BLACKLIST_EXPIRATION")
+    )
+
+    # Passive language identification
+    if values["LANGUAGE_ID_ENABLE"] and values["LANG"] not in LANGUAGE_PROFILES:
+        logger.warning(
+            "LANG (%s) has no language identification profile : "
+            "no player will be verified from his chat",
+            values["LANG"]
+        )
+
+    # Messages length
+    longest_question = values["GENERIC_QUESTION"].format(
+        *(max(values[name], key=len) for name in words_lists)
+    )
+    messages = {
+        "punish": values["GENERIC_QUESTION_INTRO"] + longest_question,
+        "SUCCESS_MESSAGE_TEXT": values["SUCCESS_MESSAGE_TEXT"],
+        "KICK_MESSAGE_TEXT": values["KICK_MESSAGE_TEXT"],
+        "TK_BAN_MESSAGE": values["TK_BAN_MESSAGE"],
+    }
+    for name, text in messages.items():
+        if len(text) > MESSAGE_LENGTH_WARNING:
+            logger.warning(
+                "%s message is %s chars long (more than %s) and may be cut",
+                name, len(text), MESSAGE_LENGTH_WARNING
+            )
+
+    return CompiledConfig(values)
+
+
+def reload_config() -> bool:
+    """
+    Reloads the configuration file and swaps the compiled snapshot.
+    The current configuration is kept if the new one is invalid.
+    """
+    global _current_config, _config_mtime
+    with _config_reload_lock:
+        try:
+            _config_mtime = os.stat(config_module.__file__).st_mtime
+            new_config = compile_config(importlib.reload(config_module))
+        except Exception as error:
+            logger.error("Configuration reload failed. Keeping the current one - %s", error)
+            return False
+        _current_config = new_config
+    logger.info("Configuration reloaded")
+    return True
+
+
+def _watch_config_file():
+    """
+    Reloads the configuration when its file is modified
+    """
+    while True:
+        sleep(CONFIG_RELOAD_CHECK_SECS)
+        try:
+            mtime = os.stat(config_module.__file__).st_mtime
+        except OSError as error:
+            logger.error("Can't read the configuration file - %s", error)
+            continue
+        if mtime != _config_mtime:
+            reload_config()
+
+
+# Logging
+# -----------------------------------------------------------------------------
+
+class _ChallengeContextFilter(logging.Filter):
+    """
+    Adds the current test fields to the log records
+    (must run in the thread that emits the record)
+    """
+    def filter(self, record):
+        record.player_id = getattr(_context, "player_id", None)
+        record.challenge_id = getattr(_context, "challenge_id", None)
+        record.stage = getattr(_context, "stage", None)
+        started = getattr(_context, "started", None)
+        record.elapsed_secs = round(time.monotonic() - started, 3) if started else None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats a log record as a JSON object
+    """
+    def format(self, record):
+        return json.dumps(
+            {
+                "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                "level": record.levelname,
+                "thread": record.threadName,
+                "message": record.getMessage(),
+                "player_id": getattr(record, "player_id", None),
+                "challenge_id": getattr(record, "challenge_id", None),
+                "stage": getattr(record, "stage", None),
+                "elapsed_secs": getattr(record, "elapsed_secs", None),
+            },
+            ensure_ascii=False
+        )
+
+
+def _setup_logging():
+    """
+    Moves the log handlers behind a queue, emptied by a background thread,
+    so a slow disk never pauses the tests
+    """
+    owner = logger if logger.handlers else logging.getLogger()
+    handlers = list(owner.handlers)
+    if config.LOG_JSON_ENABLE:
+        json_handler = logging.FileHandler(
+            os.path.join(config.DATA_DIR, f"language_doorkeeper_{get_server_number()}.jsonl"),
+            encoding="utf-8"
+        )
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+    if not handlers:
+        return
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_ChallengeContextFilter())
+    for handler in owner.handlers[:]:
+        owner.removeHandler(handler)
+    owner.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def _set_stage(stage: str):
+    """
+    Sets the current test stage, reported in the logs
+    """
+    _context.stage = stage
+
+
+# Backends calls (budget, circuit breakers)
+# -----------------------------------------------------------------------------
+
+class BackendUnavailable(Exception):
+    """
+    The backend circuit breaker is open : the call hasn't been made
+    """
+
+
+class CallTimeout(Exception):
+    """
+    The backend didn't answer within BACKEND_CALL_TIMEOUT_SECS
+    (the call is abandoned, but may still complete in the background)
+    """
+
+
+class ChallengeTimeout(BaseException):
+    """
+    The test deadline has passed.
+    Not an Exception, so the retry loops don't catch it : the test ends at once.
+    """
+
+
+# Calls priorities (lower is served first)
+PRIORITY_ACTION = 0  # punish, kick, message
+PRIORITY_ROSTER = 1  # players list, profiles, game state, database writes
+PRIORITY_LOGS = 2  # logs polls
+
+
+class CallGovernor:
+    """
+    Token bucket shared by all the RCON and database calls of the plugin.
+    When the budget is exhausted, the waiting calls are served by priority.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._tokens = None
+        self._updated = time.monotonic()
+        self._waiting = []
+        self._counter = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._tokens is None:
+            self._tokens = float(config.RCON_CALLS_BURST)
+        self._tokens = min(
+            float(config.RCON_CALLS_BURST),
+            self._tokens + (now - self._updated) * config.RCON_CALLS_PER_SEC
+        )
+        self._updated = now
+
+    def acquire(self, priority: int):
+        """
+        Waits until the call can be made
+        """
+        if config.RCON_CALLS_PER_SEC <= 0:
+            return
+        with self._cond:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    # Limit removed by a config reload
+                    if config.RCON_CALLS_PER_SEC <= 0:
+                        return
+                    self._refill()
+                    if self._waiting[0] == ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    self._cond.wait(
+                        timeout=max((1 - self._tokens) / config.RCON_CALLS_PER_SEC, 0.01)
+                    )
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+
+# Threads running the backends calls (the abandoned ones included)
+BACKEND_CALL_WORKERS = 32
+
+# Added to the punish and answering times to get a test deadline
+CHALLENGE_TIMEOUT_MARGIN_SECS = 60
+
+
+def _deadline_remaining() -> Optional[float]:
+    """
+    Returns the time left (secs) before the current test deadline,
+    or None outside of a test
+    """
+    deadline = getattr(_context, "deadline", None)
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _extend_deadline(secs: float):
+    """
+    Pushes the current test deadline out
+    (the answering time given back to the players during a logs outage)
+    """
+    if getattr(_context, "deadline", None) is not None:
+        _context.deadline += secs
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing.
+    closed : calls are made
+    open : calls are refused during CIRCUIT_BREAKER_COOLDOWN_SECS
+    half_open : a single probe call is made ; its result closes or reopens the breaker
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _cooldown_over(self) -> bool:
+        return time.monotonic() - self._opened_at >= config.CIRCUIT_BREAKER_COOLDOWN_SECS
+
+    def available(self) -> bool:
+        """
+        Returns True if the backend can be called (closed, or ready to be probed)
+        """
+        with self._lock:
+            return self.state == "closed" or (self._cooldown_over() and not self._probing)
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call can be made now
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if not self._cooldown_over():
+                    return False
+                self.state = "half_open"
+                self._probing = False
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Backend '%s' is back", self.name)
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= config.CIRCUIT_BREAKER_FAILURES:
+                if self.state == "closed":
+                    logger.error(
+                        "Backend '%s' failed %s times. Paused for %s secs.",
+                        self.name, self._failures, config.CIRCUIT_BREAKER_COOLDOWN_SECS
+                    )
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """
+        The call failed for a reason unrelated to the backend health
+        """
+        with self._lock:
+            self._probing = False
+
+
+class BackendExecutor:
+    """
+    Runs the backends calls in up to max_workers daemon threads,
+    so the abandoned calls never prevent the process from exiting
+    """
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._idle = 0
+        self._pending = 0
+
+    def submit(self, func, *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._lock:
+            # The idle threads may already be about to take the calls queued before this one
+            self._pending += 1
+            if self._pending > self._idle and self._workers < self._max_workers:
+                self._workers += 1
+                threading.Thread(
+                    target=self._work, name=f"backend_call_{self._workers}", daemon=True
+                ).start()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            future, func, args, kwargs = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+                self._pending -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as error:  # pylint: disable=broad-exception-caught
+                future.set_exception(error)
+
+
+def _call_with_config(snapshot: Optional[CompiledConfig], func, args, kwargs):
+    """
+    Runs a call in a backend_executor thread, with the caller's configuration snapshot
+    """
+    _context.config = snapshot
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _context.config = None
+
+
+def backend_call(
+    backend: Literal["rcon", "logs", "db", "discord", "steam"],
+    priority: Optional[int],
+    func,
+    *args,
+    **kwargs
+):
+    """
+    Makes a call to a backend, through its circuit breaker
+    and within the RCON calls budget (if priority is not None)
+    The call is abandoned after BACKEND_CALL_TIMEOUT_SECS,
+    or when the current test deadline passes.
+    Raises BackendUnavailable if the breaker is open,
+    CallTimeout or ChallengeTimeout if the call is abandoned.
+    """
+    remaining = _deadline_remaining()
+    if remaining is not None and remaining <= 0:
+        raise ChallengeTimeout()
+    breaker = circuit_breakers[backend]
+    if not breaker.allow():
+        raise BackendUnavailable(backend)
+    try:
+        if priority is not None:
+            call_governor.acquire(priority)
+        timeout = config.BACKEND_CALL_TIMEOUT_SECS
+        remaining = _deadline_remaining()
+        if remaining is not None:
+            timeout = min(timeout, max(remaining, 0))
+        future = backend_executor.submit(
+            _call_with_config, getattr(_context, "config", None), func, args, kwargs
+        )
+        try:
+            result = future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise CallTimeout(
+                f"{backend} - {getattr(func, '__name__', func)}() "
+                f"didn't answer in {timeout:.0f} secs"
+            ) from None
+    except CallTimeout:
+        breaker.failure()
+        remaining = _deadline_remaining()
+        if remaining is not None and remaining <= 0:
+            raise ChallengeTimeout() from None
+        raise
+    except Exception:
+        # A player can't be punished/kicked while in the lobby, dead, or gone :
+        # these failures don't tell anything about the backend health
+        if priority == PRIORITY_ACTION:
+            breaker.release()
+        else:
+            breaker.failure()
+        raise
+    breaker.success()
+    return result
+
+
+# Threads sending the commands of a batch (a slow command doesn't delay the others)
+COMMAND_BATCH_SENDERS = 16
+
+
+class CommandBatcher:
+    """
+    Collects the punish/message/kick commands issued within COMMAND_BATCH_WINDOW_MS
+    and sends them together, concurrently, over a single shared RCON connection,
+    each result (or exception) being returned to its caller
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._commands = []
+        self._rcon = None
+        self._thread = None
+        self._senders = BackendExecutor(COMMAND_BATCH_SENDERS)
+
+    def submit(self, command: Literal["punish", "message_player", "kick"], **kwargs):
+        """
+        Sends a command and waits for its result
+        """
+        if config.COMMAND_BATCH_WINDOW_MS <= 0:
+            return self._send(command, kwargs)
+        future = concurrent.futures.Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="command_batcher", daemon=True
+                )
+                self._thread.start()
+            self._commands.append((command, kwargs, future))
+            self._cond.notify()
+        try:
+            return future.result(timeout=_deadline_remaining())
+        except concurrent.futures.TimeoutError:
+            # Already being sent : its result is waited for
+            if not future.cancel():
+                return future.result()
+            raise ChallengeTimeout() from None
+
+    def submit_many(self, command: Literal["punish", "message_player", "kick"], kwargs_list: list):
+        """
+        Sends the same command to many players at once
+        Returns the results, or the exceptions, in the kwargs_list order
+        """
+        futures = [concurrent.futures.Future() for _ in kwargs_list]
+        if config.COMMAND_BATCH_WINDOW_MS <= 0:
+            for kwargs, future in zip(kwargs_list, futures):
+                self._dispatch(command, kwargs, future)
+        else:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="command_batcher", daemon=True
+                    )
+                    self._thread.start()
+                self._commands.extend(
+                    (command, kwargs, future) for kwargs, future in zip(kwargs_list, futures)
+                )
+                self._cond.notify()
+        concurrent.futures.wait(futures, timeout=_deadline_remaining())
+        if not all(future.done() for future in futures):
+            for future in futures:
+                future.cancel()
+            raise ChallengeTimeout()
+        return [future.exception() or future.result() for future in futures]
+
+    def _send(self, command: str, kwargs: dict):
+        if self._rcon is None:
+            self._rcon = Rcon(SERVER_INFO)
+        return backend_call("rcon", PRIORITY_ACTION, getattr(self._rcon, command), **kwargs)
+
+    def _dispatch(self, command: str, kwargs: dict, future: concurrent.futures.Future):
+        # Abandoned by its (timed out) test
+        if future.set_running_or_notify_cancel():
+            self._senders.submit(self._send_to, command, kwargs, future)
+
+    def _send_to(self, command: str, kwargs: dict, future: concurrent.futures.Future):
+        try:
+            future.set_result(self._send(command, kwargs))
+        except Exception as error:
+            future.set_exception(error)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._commands:
+                    self._cond.wait()
+            # Let the other tests of the batch add their commands
+            sleep(config.COMMAND_BATCH_WINDOW_MS / 1000)
+            with self._cond:
+                commands, self._commands = self._commands, []
+            for command, kwargs, future in commands:
+                self._dispatch(command, kwargs, future)
+
+
+def backends_available() -> bool:
+    """
+    Returns True if the backends needed to run a test can be called
+    """
+    unavailable = [
+        name for name in ("rcon", "logs", "db") if not circuit_breakers[name].available()
+    ]
+    if unavailable:
+        logger.warning("Backend(s) unavailable : %s. No test will be started.", unavailable)
+        return False
+    return True
+
+
+# Passive language identification
+# -----------------------------------------------------------------------------
+
+def _trigrams(text: str) -> Counter:
+    """
+    Counts the letters trigrams of a text (words are padded with spaces)
+    """
+    grams = Counter()
+    for word in re.findall(r"[^\W\d_]+", text.lower()):
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _normalized(grams: Counter) -> dict:
+    norm = sum(count * count for count in grams.values()) ** 0.5
+    return {gram: count / norm for gram, count in grams.items()} if norm else {}
+
+
+# Chat-like sample texts the languages profiles are built from
+# (same size for every language, so no profile is favored by the scores)
+# Keys : LANG values (0 english, 1 french, 2 german, 3 spanish)
+LANGUAGE_SAMPLES = {
+    0: (
+        "hello everyone, good game guys. where is the garrison? we need a garrison "
+        "on the next point please. can someone build a node, we have no munitions. "
+        "the enemy tank is behind the church, watch out. i think we should attack "
+        "the left flank now. who is the commander? thank you for the supplies. "
+        "sorry, that was my fault, i did not see you. what are you doing there? "
+        "stay with the squad and follow me. they are coming from the north, they "
+        "have a machine gun in the house. i have been killed again by the artillery. "
+        "nice shot, well done. let us go, we can still win this one if we defend "
+        "the middle. is there a medic near me? i would like to join your squad."
+    ),
+    1: (
+        "salut tout le monde, bien joué les gars. où est la garnison ? il nous faut "
+        "une garnison sur le prochain point s'il vous plaît. quelqu'un peut poser un "
+        "noeud, on n'a plus de munitions. le char ennemi est derrière l'église, "
+        "attention. je pense qu'on devrait attaquer le flanc gauche maintenant. qui "
+        "est le commandant ? merci pour les ressources. désolé, c'est ma faute, je "
+        "ne t'avais pas vu. qu'est-ce que tu fais là ? reste avec l'escouade et "
+        "suis-moi. ils arrivent par le nord, ils ont une mitrailleuse dans la maison. "
+        "je me suis encore fait tuer par l'artillerie. joli tir, bravo. allez, on "
+        "peut encore gagner si on défend le milieu. il y a un médecin près de moi ?"
+    ),
+    2: (
+        "hallo zusammen, gutes spiel leute. wo ist die garnison? wir brauchen eine "
+        "garnison auf dem nächsten punkt bitte. kann jemand einen knoten bauen, wir "
+        "haben keine munition mehr. der feindliche panzer ist hinter der kirche, "
+        "passt auf. ich denke wir sollten jetzt die linke flanke angreifen. wer ist "
+        "der kommandant? danke für den nachschub. sorry, das war mein fehler, ich "
+        "habe dich nicht gesehen. was machst du da? bleib bei dem trupp und folge "
+        "mir. sie kommen aus dem norden, sie haben ein maschinengewehr im haus. ich "
+        "wurde schon wieder von der artillerie getötet. schöner schuss, gut gemacht. "
+        "los, wir können noch gewinnen wenn wir die mitte verteidigen. ein sanitäter?"
+    ),
+    3: (
+        "hola a todos, buena partida chicos. dónde está la guarnición? necesitamos "
+        "una guarnición en el siguiente punto por favor. alguien puede construir un "
+        "nodo, no tenemos munición. el tanque enemigo está detrás de la iglesia, "
+        "cuidado. creo que deberíamos atacar el flanco izquierdo ahora. quién es el "
+        "comandante? gracias por los suministros. perdón, fue mi culpa, no te había "
+        "visto. qué estás haciendo ahí? quédate con la escuadra y sígueme. vienen "
+        "por el norte, tienen una ametralladora en la casa. me ha matado otra vez la "
+        "artillería. buen disparo, bien hecho. vamos, todavía podemos ganar si "
+        "defendemos el centro. hay un médico cerca de mí? quiero unirme a tu escuadra."
+    ),
+}
+
+
+def build_language_profiles(samples: dict) -> dict:
+    """
+    Builds a trigrams profile for each language sample text
+    """
+    return {
+        lang: MappingProxyType(_normalized(_trigrams(text)))
+        for lang, text in samples.items()
+    }
+
+
+LANGUAGE_PROFILES = MappingProxyType(build_language_profiles(LANGUAGE_SAMPLES))
+
+
+def identify_chat_languages(chats: dict) -> dict:
+    """
+    Scores the chat lines of several players against the languages profiles.
+    chats : {player_id: [chat lines]}
+    Returns {player_id: (best language, best score, margin over the second one)}
+    for the players who wrote enough letters.
+    """
+    profiles = LANGUAGE_PROFILES
+    results = {}
+    for player_id, lines in chats.items():
+        text = " ".join(lines)
+        if sum(char.isalpha() for char in text) < config.LANGUAGE_ID_MIN_LETTERS:
+            continue
+        vector = _normalized(_trigrams(text))
+        scores = sorted(
+            (
+                (sum(weight * profile.get(gram, 0) for gram, weight in vector.items()), lang)
+                for lang, profile in profiles.items()
+            ),
+            reverse=True
+        )
+        best_score, best_lang = scores[0]
+        second_score = scores[1][0] if len(scores) > 1 else 0
+        results[player_id] = (best_lang, best_score, best_score - second_score)
+    return results
+
+
+def get_recent_chats(players: list) -> dict:
+    """
+    Returns the recent chat lines of the connected players
+    {player_id: [chat lines]}
+    """
+    connected = {player["player_id"] for player in players}
+    logs = backend_call(
+        "logs",
+        PRIORITY_LOGS,
+        get_recent_logs,
+        end=10000,
+        action_filter=["CHAT"],
+        min_timestamp=int(time.time()) - config.LANGUAGE_ID_LOOKBACK_SECS
+    )
+    chats = {}
+    for log in logs["logs"]:
+        if log.get("player_id_1") in connected and log.get("sub_content"):
+            chats.setdefault(log["player_id_1"], []).append(log["sub_content"])
+    return chats
+
+
+def confidently_identified(language: tuple) -> bool:
+    """
+    Returns True if the best language of a player's chat
+    stands out enough to be trusted (see LANGUAGE_ID_MIN_SCORE, LANGUAGE_ID_MIN_MARGIN)
+    """
+    _, score, margin = language
+    return score >= config.LANGUAGE_ID_MIN_SCORE and margin >= config.LANGUAGE_ID_MIN_MARGIN
+
+
+def passive_verification(player: dict, language: tuple) -> bool:
+    """
+    Verifies a player whose chat is confidently in the target language
+    Returns True if the player has been verified
+    """
+    best_lang, score, margin = language
+    if best_lang != config.LANG or not confidently_identified(language):
+        return False
+    if config.TEST_MODE:
+        logger.info(
+            "(test mode) - '%s' - Would have been verified from chat (score %.2f).",
+            player["name"], score
+        )
+        return False
+
+    logger.info(
+        "'%s' - Chat language identified (score %.2f, margin %.2f). Verified without test.",
+        player["name"], score, margin
+    )
+    player_cache.add_flag(player["player_id"], config.VERIFIED_PLAYER_FLAG)
+    write_queue.put(
+        "flag",
+        player_id=player["player_id"],
+        player_name=player["name"],
+        flag=config.VERIFIED_PLAYER_FLAG,
+        comment=f"{config.BOT_NAME} - chat language (score {score:.2f})"
+    )
+    _record_outcome("chat", player["player_id"], [])
+    return True
+
+
+# Trust score
+# -----------------------------------------------------------------------------
+
+# Points given by the players history (the score is kept between 0 and 100)
+TRUST_PLAYTIME_POINTS = 45  # full at TRUST_PLAYTIME_FULL_HOURS
+TRUST_PLAYTIME_FULL_HOURS = 50
+TRUST_SESSIONS_POINTS = 25  # full at TRUST_SESSIONS_FULL
+TRUST_SESSIONS_FULL = 50
+TRUST_STABLE_NAME_POINTS = 10  # no more than 2 names
+TRUST_CHAT_POINTS = 20  # chat in the expected language (or minus, in another one)
+TRUST_PENALTY_POINTS = -10  # per admin kick/ban, up to 3
+TRUST_FAILED_TEST_POINTS = -30  # per recently failed test
+
+
+def trust_scores(players: list, rejoins: dict, chat_languages: dict) -> dict:
+    """
+    Computes the trust score of the players, from their CRCON profiles,
+    recently failed tests and chat languages
+    Returns {player_id: score}
+    """
+    scores = {}
+    for player in players:
+        profile = player.get("profile") or {}
+        score = 0.0
+        hours = (profile.get("total_playtime_seconds") or 0) / 3600
+        score += TRUST_PLAYTIME_POINTS * min(hours / TRUST_PLAYTIME_FULL_HOURS, 1)
+        sessions = profile.get("sessions_count") or 0
+        score += TRUST_SESSIONS_POINTS * min(sessions / TRUST_SESSIONS_FULL, 1)
+        if sessions and len(profile.get("names") or []) <= 2:
+            score += TRUST_STABLE_NAME_POINTS
+
+        penalties = profile.get("penalty_count") or {}
+        penalties_count = sum(
+            penalties.get(penalty) or 0 for penalty in ("KICK", "TEMPBAN", "PERMABAN")
+        )
+        score += TRUST_PENALTY_POINTS * min(penalties_count, 3)
+
+        rejoin = rejoins.get(player["player_id"])
+        if rejoin:
+            score += TRUST_FAILED_TEST_POINTS * rejoin["failures"]
+
+        language = chat_languages.get(player["player_id"])
+        if language and confidently_identified(language):
+            if language[0] == config.LANG:
+                score += TRUST_CHAT_POINTS
+            else:
+                score -= TRUST_CHAT_POINTS
+
+        scores[player["player_id"]] = int(min(max(score, 0), 100))
+    return scores
+
+
+# Verified players index (see language_doorkeeper_backfill.py)
+# -----------------------------------------------------------------------------
+
+class VerifiedIndex:
+    """
+    Players pre-verified by the backfill job.
+    The file is read again when it changes.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._player_ids = frozenset()
+
+    def __contains__(self, player_id: str) -> bool:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime != self._mtime:
+            try:
+                self._player_ids = load_verified_index(self.path)
+                self._mtime = mtime
+                logger.info("Verified index - %s player(s) loaded", len(self._player_ids))
+            except OSError as error:
+                logger.error("Verified index - Can't read '%s' - %s", self.path, error)
+        return player_id in self._player_ids
+
+
+# Data files
+# -----------------------------------------------------------------------------
+
+def _atomic_json_dump(path: str, data, label: str):
+    """
+    Writes a JSON file in DATA_DIR (atomic replace)
+    The callers hold their lock, so the writes of a file don't interleave.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as error:
+        logger.error("%s - Can't save '%s' - %s", label, path, error)
+
+
+# High availability (see language_doorkeeper_ha.py)
+# -----------------------------------------------------------------------------
+
+# Minimum answering time given to a test resumed after a failover
+RESUMED_MIN_ANSWER_SECS = 5
+
+
+def _standby() -> bool:
+    """
+    Returns True if this instance is the standby one (HA) :
+    the data files belong to the active instance
+    """
+    return leader_elector is not None and not leader_elector.is_leader()
+
+
+class InFlightChallenges:
+    """
+    Tests in progress, saved to a JSON file
+    so the standby instance can resume them if the active one stops
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._challenges = {}
+
+    def _save(self):
+        if not _standby():
+            _atomic_json_dump(self.path, self._challenges, "In-flight tests")
+
+    def add(self, challenge_id: str, item: dict):
+        if not config.HA_ENABLE:
+            return
+        with self._lock:
+            self._challenges[challenge_id] = dict(item, added_at=time.time())
+            self._save()
+
+    def answer_started(self, challenge_id: str, started_at: float):
+        """
+        The question has been seen : a resumed test will only watch the answers
+        """
+        if not config.HA_ENABLE:
+            return
+        with self._lock:
+            if challenge_id in self._challenges:
+                self._challenges[challenge_id]["answer_started_at"] = started_at
+                self._save()
+
+    def remove(self, challenge_id: str):
+        if not config.HA_ENABLE:
+            return
+        with self._lock:
+            if self._challenges.pop(challenge_id, None) is not None:
+                self._save()
+
+    def take_over(self) -> list:
+        """
+        Returns the tests left by the previous active instance (still worth resuming)
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                challenges = json.load(file)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as error:
+            logger.error("In-flight tests - Can't read '%s' - %s", self.path, error)
+            return []
+        now = time.time()
+        items = []
+        for item in challenges.values():
+            max_secs = (
+                config.MAX_PUNISH_RETRIES * config.PUNISH_RETRIES_INTERVAL
+                + item["time_to_answer_secs"]
+                + CHALLENGE_TIMEOUT_MARGIN_SECS
+            )
+            if now - item.pop("added_at") < max_secs:
+                items.append(item)
+        with self._lock:
+            self._challenges = {}
+            self._save()
+        return items
+
+
+def _make_lease():
+    if config.HA_LEASE_BACKEND == "redis":
+        # pylint: disable=import-outside-toplevel
+        if config.HA_REDIS_URL:
+            import redis
+            client = redis.Redis.from_url(config.HA_REDIS_URL)
+        else:
+            from rcon.cache_utils import get_redis_client
+            client = get_redis_client()
+        return RedisLease(client, f"language_doorkeeper_leader_{get_server_number()}")
+    return FileLease(
+        os.path.join(config.DATA_DIR, f"language_doorkeeper_leader_{get_server_number()}.json")
+    )
+
+
+def keep_warm():
+    """
+    Standby instance : keeps the roster and profiles caches up to date
+    """
+    _context.config = _current_config
+    try:
+        get_connected_players(Rcon(SERVER_INFO))
+    except Exception as error:
+        logger.warning("HA - Standby roster refresh failed - %s", error)
+    finally:
+        _context.config = None
+
+
+def _leadership_lost():
+    """
+    The tests in progress are left to the new active instance
+    (cancelled as on a map change)
+    """
+    logger.warning("HA - Lease lost. Tests in progress will be cancelled.")
+    match_ended.set()
+
+
+def resume_challenges():
+    """
+    New active instance : takes over the pending writes and the recent outcomes
+    of the previous one, and resumes its tests in progress
+    """
+    write_queue.load()
+    recent_outcomes.load()
+    items = inflight_challenges.take_over()
+    if not items:
+        return
+    logger.info("HA - Resuming %s test(s) in progress", len(items))
+    match_ended.clear()
+    with ThreadPool(processes=len(items)) as thread:
+        thread.map(
+            functools.partial(_process_security_question, snapshot=_current_config),
+            items
+        )
+
+
+# Recent outcomes (rejoin fast-path)
+# -----------------------------------------------------------------------------
+
+# Maximum number of players remembered
+RECENT_OUTCOMES_MAX = 5000
+
+
+class RecentOutcomes:
+    """
+    Recent tests outcomes of the players who haven't been verified,
+    kept in memory and saved to a JSON file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+        self.load()
+
+    def load(self):
+        """
+        Reads the saved records (startup, or HA takeover)
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                records = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            logger.error("Recent outcomes - Can't read '%s' - %s", self.path, error)
+            return
+        with self._lock:
+            self._records = records
+
+    def _save(self):
+        if not _standby():
+            _atomic_json_dump(self.path, self._records, "Recent outcomes")
+
+    def get(self, player_id: str) -> Optional[dict]:
+        """
+        Returns the player's record if it hasn't expired
+        {"outcome": last outcome, "attempts": tests count, "failures": failed tests count}
+        """
+        with self._lock:
+            record = self._records.get(player_id)
+        if record is None:
+            return None
+        if time.time() - record["last"] > config.REJOIN_MEMORY_HOURS * 3600:
+            return None
+        return record
+
+    def add(self, player_id: str, outcome: str) -> dict:
+        """
+        Records a test outcome and returns the updated player's record
+        """
+        if config.REJOIN_MEMORY_HOURS <= 0:
+            return {"outcome": outcome, "attempts": 1, "failures": 0, "last": time.time()}
+        previous = self.get(player_id) or {"attempts": 0, "failures": 0}
+        record = {
+            "outcome": outcome,
+            "attempts": previous["attempts"] + 1,
+            "failures": previous["failures"] + (outcome in ("kick", "coward")),
+            "last": time.time()
+        }
+        with self._lock:
+            self._records.pop(player_id, None)
+            self._records[player_id] = record
+            # Oldest records first (dicts keep the insertion order)
+            while len(self._records) > RECENT_OUTCOMES_MAX:
+                del self._records[next(iter(self._records))]
+            self._save()
+        return record
+
+    def forget(self, player_id: str):
+        with self._lock:
+            if self._records.pop(player_id, None) is not None:
+                self._save()
+
+
+# Write-behind queue
+# -----------------------------------------------------------------------------
+
+class WriteBehindQueue:
+    """
+    Durable queue of CRCON database writes (player flags, blacklist records).
+    Writes are coalesced by (kind, player_id), retried with an exponential backoff
+    and flushed in the background, so the player-facing actions never wait for them.
+    The due flags are written in a single database call per flag.
+    Pending writes are saved to a JSON file (once per change batch) and resumed after a restart.
+    """
+    WRITERS = {
+        "flag": add_flag_to_player,
+        "blacklist": add_record_to_blacklist,
+    }
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._dirty = False
+        self.metrics = {"queued": 0, "coalesced": 0, "written": 0, "retried": 0, "failed": 0}
+        self.load()
+
+    def load(self):
+        """
+        Resumes the saved pending writes (startup, or HA takeover)
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                jobs = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            logger.error("Write queue - Can't read '%s' - %s", self.path, error)
+            return
+        with self._cond:
+            self._pending = {(job["kind"], job["player_id"]): job for job in jobs}
+            if self._pending:
+                logger.info("Write queue - %s pending write(s) resumed", len(self._pending))
+
+    def _save(self):
+        self._dirty = False
+        if not _standby():
+            _atomic_json_dump(self.path, list(self._pending.values()), "Write queue")
+
+    def put(self, kind: Literal["flag", "blacklist"], player_id: str, player_name: str, **params):
+        """
+        Queues a write. A pending write of the same kind for the same player is replaced.
+        """
+        key = (kind, player_id)
+        with self._cond:
+            if key in self._pending:
+                self.metrics["coalesced"] += 1
+                self._pending[key]["params"] = params
+            else:
+                self.metrics["queued"] += 1
+                self._pending[key] = {
+                    "kind": kind,
+                    "player_id": player_id,
+                    "player_name": player_name,
+                    "params": params,
+                    "attempts": 0,
+                    "next_try": 0
+                }
+            # Saved by the writer thread, woken up now
+            self._dirty = True
+            self._cond.notify()
+
+    def is_pending(self, kind: Literal["flag", "blacklist"], player_id: str) -> bool:
+        """
+        Returns True if a write is waiting to be done for this player
+        """
+        with self._cond:
+            return (kind, player_id) in self._pending
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Writes all the due records
+        """
+        if not circuit_breakers["db"].available():
+            return
+        now = time.time()
+        with self._cond:
+            due = [dict(job) for job in self._pending.values() if job["next_try"] <= now]
+        if not due:
+            return
+
+        # Flags : one database call per flag
+        results = []
+        single = [job for job in due if job["kind"] != "flag"]
+        flags = {}
+        for job in due:
+            if job["kind"] == "flag":
+                flags.setdefault(job["params"]["flag"], []).append(job)
+        for flag, jobs in flags.items():
+            try:
+                found = backend_call(
+                    "db",
+                    PRIORITY_ROSTER,
+                    write_flags,
+                    [job["player_id"] for job in jobs],
+                    flag,
+                    {job["player_id"]: job["params"].get("comment") for job in jobs}
+                )
+            except Exception as error:
+                results.extend((job, error) for job in jobs)
+                continue
+            results.extend((job, None) for job in jobs if job["player_id"] in found)
+            # Players unknown to the database : created by add_flag_to_player()
+            single.extend(job for job in jobs if job["player_id"] not in found)
+
+        for job in single:
+            params = dict(job["params"])
+            if params.get("expires_at") is not None:
+                params["expires_at"] = datetime.fromisoformat(params["expires_at"])
+            try:
+                backend_call(
+                    "db",
+                    PRIORITY_ROSTER,
+                    self.WRITERS[job["kind"]],
+                    player_id=job["player_id"],
+                    **params
+                )
+                error = None
+            except Exception as write_error:
+                error = write_error
+            results.append((job, error))
+
+        with self._cond:
+            for job, error in results:
+                self._done(job, error)
+            self._save()
+
+    def _done(self, job: dict, error):
+        """
+        Must be called with the lock held
+        """
+        key = (job["kind"], job["player_id"])
+        current = self._pending.get(key)
+        if error is None:
+            self.metrics["written"] += 1
+            # A newer write may have been queued while this one was running
+            if current is not None and current["params"] == job["params"]:
+                del self._pending[key]
+            return
+        if current is None:
+            return
+        current["attempts"] += 1
+        if current["attempts"] >= config.WRITE_QUEUE_MAX_ATTEMPTS:
+            self.metrics["failed"] += 1
+            del self._pending[key]
+            logger.error(
+                "Write queue - '%s' - %s given up after %s attempts - %s",
+                job["player_name"], job["kind"], current["attempts"], error
+            )
+        else:
+            self.metrics["retried"] += 1
+            delay = min(
+                config.WRITE_QUEUE_RETRY_DELAY_SECS * 2 ** (current["attempts"] - 1),
+                config.WRITE_QUEUE_MAX_RETRY_DELAY_SECS
+            )
+            current["next_try"] = time.time() + delay
+            logger.warning(
+                "Write queue - '%s' - %s failed. Will retry in %s secs - %s",
+                job["player_name"], job["kind"], delay, error
+            )
+
+    def run(self):
+        """
+        Background writer loop
+        """
+        while True:
+            with self._cond:
+                if not self._dirty:
+                    self._cond.wait(timeout=config.WRITE_QUEUE_FLUSH_INTERVAL_SECS)
+                # The new writes are saved before being flushed
+                if self._dirty:
+                    self._save()
+            if _standby():
+                continue
+            try:
+                self.flush()
+            except Exception as error:
+                logger.error("Write queue - flush failed - %s", error)
+
+    def log_metrics(self):
+        logger.info(
+            "Write queue - %s pending - %s",
+            self.pending_count(),
+            " - ".join(f"{name} : {value}" for name, value in self.metrics.items())
+        )
+
+
+# Players roster
+# -----------------------------------------------------------------------------
+
+class PlayerCache:
+    """
+    Connected players, in the rcon.get_players() format.
+    Only the ids/names roster is fetched every turn :
+    the CRCON profiles are loaded for new players or when expired.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._players = {}
+        self.ready = False
+
+    def fill(self, players: list):
+        """
+        Replaces the cache content with a full rcon.get_players() result
+        """
+        now = time.time()
+        with self._lock:
+            self._players = {}
+            for player in players:
+                profile = player.get("profile") or {}
+                self._players[player["player_id"]] = {
+                    "player": player,
+                    "loaded_at": now,
+                    "seen_since": now - (profile.get("current_playtime_seconds") or 0)
+                }
+            self.ready = True
+
+    def refresh(self, roster: list) -> list:
+        """
+        Updates the cache from a rcon.get_player_ids() result
+        and returns the connected players
+        """
+        now = time.time()
+        connected = {player_id: name for name, player_id in roster}
+        with self._lock:
+            for player_id in list(self._players):
+                if player_id not in connected:
+                    del self._players[player_id]
+            to_load = [
+                player_id for player_id in connected
+                if player_id not in self._players
+                or now - self._players[player_id]["loaded_at"] > config.PROFILE_CACHE_TTL_SECS
+            ]
+
+        loaded = {}
+        for player_id in to_load:
+            prefetched = profile_prefetcher.get(player_id)
+            if prefetched is not None:
+                loaded[player_id] = prefetched["player"]
+                continue
+            try:
+                loaded[player_id] = _load_player(connected[player_id], player_id)
+            except Exception as error:
+                logger.error(
+                    "'%s' - CRCON profile can't be loaded - %s", connected[player_id], error
+                )
+
+        players = []
+        with self._lock:
+            for player_id, name in connected.items():
+                entry = self._players.get(player_id)
+                if player_id in loaded:
+                    if entry is None:
+                        entry = {"seen_since": now}
+                        self._players[player_id] = entry
+                    entry["player"] = loaded[player_id]
+                    entry["loaded_at"] = now
+                elif entry is None:
+                    # Profile couldn't be loaded : will retry on next turn
+                    continue
+                player = dict(entry["player"], name=name)
+                if player.get("profile"):
+                    player["profile"] = dict(
+                        player["profile"],
+                        current_playtime_seconds=int(now - entry["seen_since"])
+                    )
+                players.append(player)
+        if loaded:
+            logger.info(
+                "Roster - %s player(s) connected - %s profile(s) loaded",
+                len(connected), len(loaded)
+            )
+        return players
+
+    def add_flag(self, player_id: str, flag: str):
+        """
+        Adds a flag to a cached profile, as it won't be loaded again before expiration
+        """
+        with self._lock:
+            entry = self._players.get(player_id)
+            if entry is None or not entry["player"].get("profile"):
+                return
+            profile = entry["player"]["profile"]
+            entry["player"] = dict(
+                entry["player"],
+                profile=dict(profile, flags=list(profile.get("flags", [])) + [{"flag": flag}])
+            )
+
+
+def _load_player(player_name: str, player_id: str) -> dict:
+    """
+    Loads a player's CRCON profile, in the rcon.get_players() format
+    """
+    profile = backend_call(
+        "db", PRIORITY_ROSTER, get_player_profile, player_id=player_id, nb_sessions=0
+    )
+    steaminfo = (profile or {}).get("steaminfo") or {}
+    return {
+        "name": player_name,
+        "player_id": player_id,
+        "country": steaminfo.get("country"),
+        "profile": profile or {"flags": []}
+    }
+
+
+def get_connected_players(rcon: Rcon) -> list:
+    """
+    Returns the connected players, in the rcon.get_players() format
+    """
+    if not config.LIGHT_ROSTER_ENABLE or not player_cache.ready:
+        players = backend_call("rcon", PRIORITY_ROSTER, rcon.get_players)
+        player_cache.fill(players)
+        return players
+    return player_cache.refresh(backend_call("rcon", PRIORITY_ROSTER, rcon.get_player_ids))
+
+
+# Profiles prefetch
+# -----------------------------------------------------------------------------
+
+# Maximum number of prefetched players
+PREFETCH_CACHE_MAX = 500
+
+
+class ProfilePrefetcher:
+    """
+    Loads the profile, VIP status and links of the players
+    as soon as they connect (CONNECTED logs), so the tests don't wait for them.
+    Entries expire after PROFILE_CACHE_TTL_SECS.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._last_timestamp_ms = time.time() * 1000
+
+    def get(self, player_id: str) -> Optional[dict]:
+        """
+        Returns the prefetched data if it hasn't expired
+        {"player": rcon.get_players() format, "vip_short": bool or None,
+        "profile_url": str, "avatar_url": str}
+        """
+        with self._lock:
+            entry = self._entries.get(player_id)
+        if entry is None or time.time() - entry["loaded_at"] > config.PROFILE_CACHE_TTL_SECS:
+            return None
+        return entry
+
+    def prefetch(self, rcon: Rcon, player_name: str, player_id: str):
+        """
+        Loads a player's data
+        """
+        entry = {
+            "player": _load_player(player_name, player_id),
+            "vip_short": None,
+            "profile_url": common_functions.get_external_profile_url(player_id, player_name),
+            "avatar_url": common_functions.get_avatar_url(player_id),
+            "loaded_at": time.time()
+        }
+        if config.WHITELIST_VIP_HOURS > 0:
+            entry["vip_short"] = backend_call(
+                "rcon",
+                PRIORITY_ROSTER,
+                common_functions.is_vip_for_less_than_xh,
+                rcon, player_id,
+                config.WHITELIST_VIP_HOURS
+            )
+        with self._lock:
+            self._entries.pop(player_id, None)
+            self._entries[player_id] = entry
+            # Oldest entries first (dicts keep the insertion order)
+            while len(self._entries) > PREFETCH_CACHE_MAX:
+                del self._entries[next(iter(self._entries))]
+
+    def run(self):
+        """
+        Watches the connections (background thread)
+        """
+        rcon = Rcon(SERVER_INFO)
+        while True:
+            sleep(config.PREFETCH_POLL_SECS)
+            if not config.PREFETCH_ENABLE:
+                self._last_timestamp_ms = time.time() * 1000
+                continue
+            try:
+                logs = backend_call(
+                    "logs",
+                    PRIORITY_LOGS,
+                    get_recent_logs,
+                    end=100,
+                    action_filter=["CONNECTED"],
+                    min_timestamp=int(self._last_timestamp_ms / 1000)
+                )
+            except Exception as error:
+                logger.warning("Prefetch - Can't read the logs - %s", error)
+                continue
+            for log in logs["logs"]:
+                if log["timestamp_ms"] <= self._last_timestamp_ms or not log.get("player_id_1"):
+                    continue
+                try:
+                    self.prefetch(rcon, log["player_name_1"], log["player_id_1"])
+                except Exception as error:
+                    logger.warning("'%s' - Prefetch failed - %s", log["player_name_1"], error)
+            self._last_timestamp_ms = max(
+                [self._last_timestamp_ms] + [log["timestamp_ms"] for log in logs["logs"]]
+            )
+
+
+def profile_url(player_id: str, player_name: str) -> str:
+    entry = profile_prefetcher.get(player_id)
+    if entry is not None:
+        return entry["profile_url"]
+    return common_functions.get_external_profile_url(player_id, player_name)
+
+
+def avatar_url(player_id: str) -> str:
+    entry = profile_prefetcher.get(player_id)
+    if entry is not None:
+        return entry["avatar_url"]
+    return common_functions.get_avatar_url(player_id)
+
+
+# Admission control
+# -----------------------------------------------------------------------------
+
+class ChallengeStats:
+    """
+    Durations measured on the previous tests,
+    used to estimate how long a new one will take
+    """
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._samples = {
+            "punish_secs": deque(maxlen=size),
+            "answer_secs": deque(maxlen=size),
+            "kick_secs": deque(maxlen=size),
+        }
+        # Answering time not used thanks to the early verdicts
+        self.early_verdicts = 0
+        self.saved_secs = 0.0
+
+    def add(self, name: str, value: float):
+        with self._lock:
+            self._samples[name].append(value)
+
+    def add_early_verdict(self, saved_secs: float):
+        with self._lock:
+            self.early_verdicts += 1
+            self.saved_secs += max(saved_secs, 0)
+
+    def log_metrics(self):
+        with self._lock:
+            logger.info(
+                "Early verdicts - %s test(s) - %s slot secs saved",
+                self.early_verdicts, int(self.saved_secs)
+            )
+
+    def percentile(self, name: str, default: float) -> float:
+        """
+        Returns the ADMISSION_PERCENTILE value of a measure
+        or the default value if it has never been measured
+        """
+        with self._lock:
+            values = sorted(self._samples[name])
+        if not values:
+            return default
+        index = max(0, -(-len(values) * config.ADMISSION_PERCENTILE // 100) - 1)
+        return values[min(index, len(values) - 1)]
+
+    def estimate_secs(self) -> float:
+        """
+        Estimated duration of a test, from the punish to the kick
+        (punish_secs : readiness waits and punish retries included)
+        """
+        return (
+            self.percentile(
+                "punish_secs", config.MAX_PUNISH_RETRIES * config.PUNISH_RETRIES_INTERVAL
+            )
+            + self.percentile("answer_secs", config.TIME_TO_ANSWER_SEC)
+            + self.percentile("kick_secs", 5)
+        )
+
+
+def _watch_match_end(batch_done: threading.Event):
+    """
+    Sets match_ended if the game ends while a batch is processed
+    (or if this instance isn't the active one anymore)
+    """
+    start_timestamp_int = int(time.time())
+    while not batch_done.wait(MATCH_END_CHECK_SECS):
+        if _standby():
+            _leadership_lost()
+            return
+        try:
+            logs = backend_call(
+                "logs",
+                PRIORITY_LOGS,
+                get_recent_logs,
+                end=10,
+                action_filter=["MATCH ENDED", "MATCH START"],
+                min_timestamp=start_timestamp_int
+            )
+        except Exception as error:
+            logger.error("Couldn't get the logs to detect a map change - %s", error)
+            continue
+        if logs["logs"]:
+            logger.warning("Map change detected. Tests in progress will be cancelled.")
+            match_ended.set()
+            return
+
+
 def should_we_run():
     """
     Test various running conditions before monitoring players
     """
+    _context.config = _current_config
+    try:
+        _should_we_run()
+    finally:
+        _context.config = None
+
+
+def _should_we_run():
     # Don't run : outside activity schedule
     seconds_before_start = common_functions.seconds_until_start(config.SCHEDULE)
     if seconds_before_start != 0:
@@ -48,15 +1801,17 @@ def should_we_run():
     # Get server infos
     rcon = Rcon(SERVER_INFO)
     try:
-        gamestate = rcon.get_gamestate()
+        gamestate = backend_call("rcon", PRIORITY_ROSTER, rcon.get_gamestate)
     except Exception as error:
         logger.error("get_gamestate() failed - %s", error)
         return
 
     # Don't run : there's no more than DONT_KICK_BELOW players on
+    # (unless some players can be tested while seeding)
     # Wait for 5 * WATCH_INTERVAL_SECS
     players_count = gamestate["num_allied_players"] + gamestate["num_axis_players"]
-    if players_count <= config.DONT_KICK_BELOW:
+    seeding = players_count <= config.DONT_KICK_BELOW
+    if seeding and (config.SEEDING_PLAYERS_TO_CHECK == 0 or players_count == 0):
         logger.info(
             "Not enough players on map (%s/%s). Next check in %s minutes.",
             str(players_count),
@@ -66,42 +1821,116 @@ def should_we_run():
         sleep(config.WATCH_INTERVAL_SECS * 5)
         return
 
-    # Don't run : the game is ending in less than 2 * TIME_TO_ANSWER_SEC
+    # Don't run : a test would likely end after the game
     # Wait for 5 * WATCH_INTERVAL_SECS
     remain_hours, remain_mins, remain_secs = gamestate["raw_time_remaining"].split(':')
     remain_time_secs = int(remain_hours) * 3600 + int(remain_mins) * 60 + int(remain_secs)
-    if remain_time_secs < (2 * config.TIME_TO_ANSWER_SEC):
+    estimated_secs = challenge_stats.estimate_secs()
+    if remain_time_secs < estimated_secs + config.ADMISSION_MARGIN_SECS:
         logger.info(
-            "Game is ending (%s secs remaining). Next check in %s minutes.",
+            "Game is ending (%s secs remaining, a test takes up to %s secs). "
+            "Next check in %s minutes.",
             remain_time_secs,
+            int(estimated_secs),
             str(round((config.WATCH_INTERVAL_SECS * 5), 1) / 60)
         )
         sleep(config.WATCH_INTERVAL_SECS * 5)
         return
 
+    # Don't run : a backend needed by the tests is unavailable
+    if not backends_available():
+        return
+
     # Let's run !
-    filter_players(rcon=rcon, players_count=players_count)
+    filter_players(rcon=rcon, players_count=players_count, seeding=seeding)
+
+    # Seeding : low intensity
+    if seeding:
+        sleep(config.WATCH_INTERVAL_SECS * 5)
 
 
 def filter_players(
     rcon: Rcon,
-    players_count: int
+    players_count: int,
+    seeding: bool = False
 ):
     """
     Find the players whom language isn't known/guessable
+    (seeding : up to SEEDING_PLAYERS_TO_CHECK players, who won't be kicked)
     """
     try:
-        players = rcon.get_players()
+        players = get_connected_players(rcon)
     except Exception as error:
-        logger.error("get_players() failed - %s", error)
+        logger.error("get_connected_players() failed - %s", error)
         return
 
+    # Recent chat languages
+    chat_languages = {}
+    if config.LANGUAGE_ID_ENABLE:
+        try:
+            chat_languages = identify_chat_languages(get_recent_chats(players))
+        except Exception as error:
+            logger.error("Chat language identification failed - %s", error)
+
+    # Steam countries missing in CRCON profiles
+    countries = {}
+    if config.WHITELIST_STEAM_COUNTRY and config.STEAM_COUNTRY_RESOLVE_ENABLE:
+        countries = steam_countries.resolve(
+            [player["player_id"] for player in players if not player.get("country")]
+        )
+
     # Multithreading init
-    max_players_in_batch = min(players_count - config.DONT_KICK_BELOW, config.MAX_PLAYERS_TO_CHECK)
+    if seeding:
+        max_players_in_batch = config.SEEDING_PLAYERS_TO_CHECK
+    else:
+        max_players_in_batch = min(
+            players_count - config.DONT_KICK_BELOW, config.MAX_PLAYERS_TO_CHECK
+        )
+    # Broadcast : all the candidates are collected (one distinct word each)
+    broadcast = config.BROADCAST_ENABLE and not seeding
+    max_candidates = max_players_in_batch
+    if broadcast:
+        max_candidates = min(
+            players_count - config.DONT_KICK_BELOW,
+            config.BROADCAST_MAX_PLAYERS,
+            len(config.FIRST_WORDS_LIST)
+        )
+    first_words = random.sample(config.FIRST_WORDS_LIST, len(config.FIRST_WORDS_LIST))
     to_check = []
 
+    # Players who recently failed a test (here or on another server) are handled first
+    rejoins = {}
+    shared = {}
+    for player in players:
+        record = recent_outcomes.get(player["player_id"])
+        if config.SHARED_IDS_ENABLE:
+            shared[player["player_id"]] = _shared_outcome(player["player_id"])
+        if record is not None and record["failures"] > 0:
+            rejoins[player["player_id"]] = record
+        elif shared.get(player["player_id"]) in ("kick", "coward"):
+            rejoins[player["player_id"]] = {
+                "outcome": shared[player["player_id"]], "failures": 1
+            }
+    # then the players with the lowest trust scores
+    scores = {}
+    if config.TRUST_SCORE_ENABLE:
+        scores = trust_scores(players, rejoins, chat_languages)
+    players = sorted(
+        players,
+        key=lambda player: (player["player_id"] not in rejoins, scores.get(player["player_id"], 0))
+    )
+
+    # Players who failed a seeding test will be tested again once seeding is over
+    if not seeding:
+        seeding_spared.clear()
+
     # Analyze all the players
     for player in players:
+        rejoin = rejoins.get(player["player_id"])
+
+        if seeding and player["player_id"] in seeding_spared:
+            continue
+
         try:
             profile = player.get("profile")
         except Exception as error:
@@ -113,35 +1942,77 @@ def filter_players(
         if any(f["flag"] in config.WHITELIST_CRCON_EMOJI_FLAGS for f in flags):
             continue
 
+        # Validated, but the flag hasn't been written to the CRCON profile yet
+        if write_queue.is_pending("flag", player["player_id"]):
+            continue
+
+        # Pre-verified from the players history
+        if player["player_id"] in verified_index:
+            continue
+
+        # Verified on another game server
+        if shared.get(player["player_id"]) == "valid":
+            continue
+
         # Whitelisted country on Steam profile
         if config.WHITELIST_STEAM_COUNTRY:
             try:
-                if player["country"] in config.WHITELIST_STEAM_COUNTRIES:
+                country = player["country"] or countries.get(player["player_id"])
+                if country in config.WHITELIST_STEAM_COUNTRIES:
                     continue
             except Exception as error:
                 logger.warning("'%s' - Can't get Steam profile country - %s", player["name"], error)
 
         # Don't test if the player's pseudo contains a pattern
         if config.WHITELIST_PSEUDO_ENABLE:
-            if re.findall(
-                config.WHITELIST_PSEUDO_REGEX, player["name"], re.IGNORECASE
-            ):
+            if config.WHITELIST_PSEUDO_PATTERN.search(player["name"]):
+                continue
+
+        # Already chatted in the expected language
+        if player["player_id"] in chat_languages:
+            if passive_verification(player, chat_languages[player["player_id"]]):
                 continue
 
+        # Trusted from history
+        if (
+            config.TRUST_EXEMPT_SCORE > 0
+            and scores.get(player["player_id"], 0) >= config.TRUST_EXEMPT_SCORE
+        ):
+            continue
+
         # Connected since less than 60s (not on map yet : can't be punished)
+        # (unless the player recently failed a test)
         try:
             current_playtime_seconds = profile.get("current_playtime_seconds") if profile else 0
-            if (current_playtime_seconds < 60 or current_playtime_seconds > 86400):
+            if current_playtime_seconds > 86400 or (
+                current_playtime_seconds < 60
+                and not (rejoin and config.REJOIN_SKIP_GRACE)
+            ):
                 continue
         except Exception as error:
             logger.error("'%s' - Can't get current_playtime_seconds - %s", player["name"], error)
 
         # The player has a "real" VIP (not temporary seeder's or gameplay reward)
         if config.WHITELIST_VIP_HOURS > 0:
-            if not common_functions.is_vip_for_less_than_xh(
-                rcon, player["player_id"],
-                config.WHITELIST_VIP_HOURS
-            ):
+            prefetched = profile_prefetcher.get(player["player_id"])
+            if prefetched is not None and prefetched["vip_short"] is not None:
+                vip_short = prefetched["vip_short"]
+            else:
+                try:
+                    vip_short = backend_call(
+                        "rcon",
+                        PRIORITY_ROSTER,
+                        common_functions.is_vip_for_less_than_xh,
+                        rcon, player["player_id"],
+                        config.WHITELIST_VIP_HOURS
+                    )
+                except Exception as error:
+                    logger.error(
+                        "'%s' - Can't check the VIP. Will be tested in next batch - %s",
+                        player["name"], error
+                    )
+                    continue
+            if not vip_short:
                 logger.warning(
                     "'%s' - Has a VIP that expires in more than %sh",
                     player["name"],
@@ -150,7 +2021,7 @@ def filter_players(
                 continue
 
         # No exemption could be found : this player will be tested
-        if len(to_check) < max_players_in_batch:
+        if len(to_check) < max_candidates:
 
             if config.TEST_MODE:
                 dry_run_warning = "(DRY RUN) - "
@@ -161,52 +2032,363 @@ def filter_players(
                 dry_run_warning,
                 player["name"],
                 str(timedelta(seconds=current_playtime_seconds)),
-                common_functions.get_external_profile_url(player["player_id"], player["name"])
+                profile_url(player["player_id"], player["name"])
+            )
+            if config.TRUST_SCORE_ENABLE:
+                logger.info("'%s' - Trust score : %s", player["name"], scores[player["player_id"]])
+            if rejoin:
+                logger.info(
+                    "'%s' - Is back after %s failed test(s) (last : %s)",
+                    player["name"], rejoin["failures"], rejoin["outcome"]
+                )
+
+            # Different words within a batch
+            question_first_word_random = first_words[len(to_check) % len(first_words)]
+            question_sentence = config.GENERIC_QUESTION.format(
+                question_first_word_random,
+                random.choice(config.SECOND_WORDS_LIST),
+                random.choice(config.THIRD_WORDS_LIST),
+                random.choice(config.FOURTH_WORDS_LIST)
+            )
+
+            # Add the player to the batch
+            to_check.append(
+                {
+                    "player_name": player['name'],
+                    "player_id": player['player_id'],
+                    "question_sentence": question_sentence,
+                    "expected_answers_list": [question_first_word_random],
+                    "time_to_answer_secs": (
+                        config.REJOIN_TIME_TO_ANSWER_SEC if rejoin else 0
+                    ) or config.TIME_TO_ANSWER_SEC
+                }
+            )
+
+        # Batch now contains max_players_in_batch : process them
+        else:
+            break
+
+    # Not enough players for a broadcast : regular batch
+    if broadcast and len(to_check) < config.BROADCAST_MIN_PLAYERS:
+        broadcast = False
+        to_check = to_check[:max_players_in_batch]
+
+    # Batch processing
+    try:
+        if len(to_check) > 0:
+            logger.info(
+                "\n\n--- New batch - %s player(s) to check ---"
+                "---------------------------------------%s",
+                len(to_check),
+                "\n(seeding : no kick)" if seeding else "\n(broadcast)" if broadcast else ""
+            )
+            match_ended.clear()
+            batch_done = threading.Event()
+            threading.Thread(
+                target=_watch_match_end, args=(batch_done,), name="match_end", daemon=True
+            ).start()
+            try:
+                if broadcast:
+                    broadcast_security_question(to_check, snapshot=_context.config)
+                else:
+                    with ThreadPool(processes=len(to_check)) as thread:
+                        thread.map(
+                            functools.partial(
+                                _process_security_question, snapshot=_context.config, soft=seeding
+                            ),
+                            to_check
+                        )
+            finally:
+                batch_done.set()
+            logger.info(
+                "\n--- End of batch processing ------------"
+                "---------------------------------------\n"
+            )
+            write_queue.log_metrics()
+            challenge_stats.log_metrics()
+    except Exception as error:
+        logger.error("_process_security_question() failed : %s", error)
+
+
+def _process_security_question(item, snapshot: CompiledConfig, soft: bool = False):
+    """
+    Runs a test (item : ask_security_question() arguments,
+    and "answer_started_at" when resumed after the question has been seen)
+    """
+    item = dict(item)
+    answer_started_at = item.pop("answer_started_at", None)
+    _context.config = snapshot
+    _context.soft = soft
+    _context.player_id = item["player_id"]
+    _context.challenge_id = uuid.uuid4().hex[:8]
+    _context.started = time.monotonic()
+    _context.started_at = time.time()
+    _context.punish_attempts = 0
+    _context.deadline = _context.started + (
+        config.CHALLENGE_TIMEOUT_SECS
+        or config.MAX_PUNISH_RETRIES * config.PUNISH_RETRIES_INTERVAL
+        + item["time_to_answer_secs"]
+        + CHALLENGE_TIMEOUT_MARGIN_SECS
+    )
+    inflight_challenges.add(_context.challenge_id, item)
+    try:
+        if answer_started_at is None:
+            ask_security_question(**item)
+        else:
+            # Answers sent before the failover are read from the logs
+            elapsed_secs = time.time() - answer_started_at
+            watch_logs(
+                rcon=Rcon(SERVER_INFO),
+                started_at=answer_started_at,
+                **dict(item, time_to_answer_secs=int(elapsed_secs + max(
+                    item["time_to_answer_secs"] - elapsed_secs, RESUMED_MIN_ANSWER_SECS
+                )))
+            )
+    except ChallengeTimeout:
+        logger.warning(
+            "'%s' - Test timed out after %s secs (stage : %s).",
+            item["player_name"],
+            int(time.monotonic() - _context.started),
+            getattr(_context, "stage", None)
+        )
+        _record_outcome("timeout", item["player_id"], item["expected_answers_list"])
+    finally:
+        inflight_challenges.remove(_context.challenge_id)
+        _context.config = _context.soft = _context.deadline = None
+        _context.player_id = _context.challenge_id = _context.stage = _context.started = None
+
+
+# Threads applying the verdicts of a broadcast (their commands are batched)
+BROADCAST_VERDICT_THREADS = 16
+
+
+def broadcast_security_question(to_check: list, snapshot: CompiledConfig):
+    """
+    Tests all the players at once (BROADCAST_ENABLE) :
+    - sends all the questions in a single fan-out (private messages)
+    - reads all the answers from the same logs, within a single answer window
+    - applies the verdicts in bulk when the window closes
+    """
+    _context.config = snapshot
+    time_to_answer_secs = max(item["time_to_answer_secs"] for item in to_check)
+    _context.deadline = time.monotonic() + time_to_answer_secs + CHALLENGE_TIMEOUT_MARGIN_SECS
+    challenges = {}
+    try:
+        if config.TEST_MODE:
+            for item in to_check:
+                logger.info("(test mode) -  '%s' - Would have been tested.", item["player_name"])
+            return
+
+        _set_stage("message")
+        fanout_start = time.monotonic()
+        results = command_batcher.submit_many(
+            "message_player",
+            [
+                {
+                    "player_name": item["player_name"],
+                    "player_id": item["player_id"],
+                    "message": config.GENERIC_QUESTION_INTRO + item["question_sentence"],
+                    "by": config.BOT_NAME
+                }
+                for item in to_check
+            ]
+        )
+        started_at = time.time()
+        fanout_secs = time.monotonic() - fanout_start
+        for item, result in zip(to_check, results):
+            if isinstance(result, Exception):
+                logger.warning(
+                    "'%s' - Question message couldn't be sent. Will be tested in next batch - %s",
+                    item["player_name"], result
+                )
+                continue
+            item = dict(item, time_to_answer_secs=time_to_answer_secs)
+            challenge_id = uuid.uuid4().hex[:8]
+            inflight_challenges.add(challenge_id, dict(item, answer_started_at=started_at))
+            challenge_stats.add("punish_secs", fanout_secs)
+            challenges[item["player_id"]] = dict(
+                item,
+                challenge_id=challenge_id,
+                started_at=started_at,
+                his_answers_list=[],
+                verdict=None,
+                total_answer_time_secs=0
+            )
+        logger.info(
+            "Broadcast - %s/%s questions sent in %.1f secs",
+            len(challenges), len(to_check), fanout_secs
+        )
+        if challenges:
+            watch_broadcast_logs(challenges, started_at, time_to_answer_secs)
+
+    except ChallengeTimeout:
+        logger.warning("Broadcast - Timed out (stage : %s).", getattr(_context, "stage", None))
+        for challenge in challenges.values():
+            if challenge["verdict"] is None:
+                challenge["verdict"] = "timeout"
+
+    finally:
+        _context.deadline = _context.stage = None
+
+    # Bulk verdicts
+    for challenge in challenges.values():
+        if challenge["verdict"] is None and match_ended.is_set():
+            challenge["verdict"] = "cancelled"
+        if challenge["verdict"] in ("cancelled", "timeout"):
+            logger.info("'%s' - Test %s.", challenge["player_name"], challenge["verdict"])
+            _context.started_at = challenge["started_at"]
+            _record_outcome(
+                challenge["verdict"], challenge["player_id"], challenge["expected_answers_list"]
+            )
+            inflight_challenges.remove(challenge["challenge_id"])
+    verdicts = [
+        challenge for challenge in challenges.values()
+        if challenge["verdict"] not in ("cancelled", "timeout")
+    ]
+    if verdicts:
+        with ThreadPool(processes=min(len(verdicts), BROADCAST_VERDICT_THREADS)) as thread:
+            thread.map(
+                functools.partial(_apply_broadcast_verdict, snapshot=snapshot), verdicts
             )
+    _context.started_at = None
 
-            generic_question = config.GENERIC_QUESTION
-            question_first_word_random = random.choice(config.FIRST_WORDS_LIST)
-            question_sentence = generic_question.format(
-                question_first_word_random,
-                random.choice(config.SECOND_WORDS_LIST),
-                random.choice(config.THIRD_WORDS_LIST),
-                random.choice(config.FOURTH_WORDS_LIST)
+
+def watch_broadcast_logs(challenges: dict, started_at: float, time_to_answer_secs: int):
+    """
+    Monitor server logs for all the broadcast tests at once
+    Sets the challenges "verdict" : "tk", "disconnected", "valid"
+    or "wrong" (no valid answer when the window closes)
+    """
+    _set_stage("answer")
+    player_ids = {
+        challenge["player_name"]: player_id for player_id, challenge in challenges.items()
+    }
+    undecided = len(challenges)
+    last_timestamp_int = int(started_at)
+
+    # Time lost while the logs couldn't be read is given back to the players
+    # (up to time_to_answer_secs)
+    extension_secs = 0
+
+    while time.time() - started_at - extension_secs <= time_to_answer_secs and undecided:
+        if match_ended.is_set():
+            logger.info("Broadcast - Map change. Tests cancelled.")
+            return
+        call_start = time.monotonic()
+        try:
+            logs = backend_call(
+                "logs",
+                PRIORITY_LOGS,
+                get_recent_logs,
+                end=10000,
+                action_filter=["CHAT", "DISCONNECTED", "TEAM KILL"],
+                min_timestamp=last_timestamp_int
             )
+        except Exception as error:
+            logger.error("Broadcast - Couldn't get the logs - %s", error)
+            sleep(5)
+            added_secs = min(
+                extension_secs + time.monotonic() - call_start, time_to_answer_secs
+            ) - extension_secs
+            extension_secs += added_secs
+            _extend_deadline(added_secs)
+            continue
 
-            # Add the player to the batch
-            to_check.append(
-                {
-                    "player_name": player['name'],
-                    "player_id": player['player_id'],
-                    "question_sentence": question_sentence,
-                    "expected_answers_list": [question_first_word_random]
-                }
+        # Oldest first : the first event decides the verdict
+        for log in sorted(logs["logs"], key=lambda log: log.get("timestamp_ms", 0)):
+            challenge = challenges.get(
+                log.get("player_id_1") or player_ids.get(log.get("player_name_1"))
             )
+            if challenge is None or challenge["verdict"] is not None:
+                continue
+            answer_secs = max(int(log.get("timestamp_ms", 0) / 1000 - started_at), 0)
+
+            if log["action"] == "TEAM KILL":
+                challenge["verdict"] = "tk"
+            elif log["action"] == "DISCONNECTED":
+                challenge["verdict"] = "disconnected"
+            elif log.get("sub_content"):
+                if log["sub_content"] not in challenge["his_answers_list"]:
+                    challenge["his_answers_list"].append(log["sub_content"])
+                if valid_answer(log["sub_content"], challenge["expected_answers_list"]):
+                    challenge["verdict"] = "valid"
+            if challenge["verdict"] is not None:
+                challenge["total_answer_time_secs"] = answer_secs
+                undecided -= 1
+
+        # Logs of the last second may not be complete yet : they will be read again
+        if logs["logs"]:
+            last_timestamp_int = max(
+                last_timestamp_int,
+                int(max(log.get("timestamp_ms", 0) for log in logs["logs"]) / 1000)
+            )
+        sleep(1)
 
-        # Batch now contains max_players_in_batch : process them
-        else:
-            break
+    if match_ended.is_set():
+        logger.info("Broadcast - Map change. Tests cancelled.")
+        return
+    for challenge in challenges.values():
+        if challenge["verdict"] is None:
+            challenge["verdict"] = "wrong"
+            challenge["total_answer_time_secs"] = int(time.time() - started_at)
 
-    # Batch processing
+
+def _apply_broadcast_verdict(challenge: dict, snapshot: CompiledConfig):
+    """
+    Ends a broadcast test, as a regular one would
+    """
+    _context.config = snapshot
+    _context.soft = False
+    _context.player_id = challenge["player_id"]
+    _context.challenge_id = challenge["challenge_id"]
+    _context.started = time.monotonic()
+    _context.started_at = challenge["started_at"]
+    _context.punish_attempts = 0
+    _context.deadline = _context.started + CHALLENGE_TIMEOUT_MARGIN_SECS
+    player_name = challenge["player_name"]
+    total_answer_time_secs = challenge["total_answer_time_secs"]
     try:
-        if len(to_check) > 0:
+        if challenge["verdict"] == "valid":
             logger.info(
-                "\n\n--- New batch - %s player(s) to check ---"
-                "---------------------------------------",
-                len(to_check)
+                "'%s' - Gave a valid answer in %s secs.", player_name, total_answer_time_secs
             )
-            with ThreadPool(processes=len(to_check)) as thread:
-                thread.map(_process_security_question, to_check)
-            logger.info(
-                "\n--- End of batch processing ------------"
-                "---------------------------------------\n"
+        elif challenge["verdict"] == "tk":
+            logger.info("'%s' - Committed a TK in %s secs.", player_name, total_answer_time_secs)
+        elif challenge["verdict"] == "disconnected":
+            logger.info("'%s' - Has disconnected in %s secs.", player_name, total_answer_time_secs)
+        challenge_stats.add("answer_secs", total_answer_time_secs)
+
+        kwargs = {
+            "rcon": Rcon(SERVER_INFO),
+            "player_name": player_name,
+            "player_id": challenge["player_id"],
+            "question_sentence": challenge["question_sentence"],
+            "expected_answers_list": challenge["expected_answers_list"],
+            "his_answers_list": challenge["his_answers_list"],
+            "total_answer_time_secs": total_answer_time_secs
+        }
+        if challenge["verdict"] == "valid":
+            success(**kwargs)
+        else:
+            if not kwargs["his_answers_list"]:
+                kwargs["his_answers_list"] = [TRANSL['blank'][config.LANG]]
+            failure(
+                answered_with_tk=challenge["verdict"] == "tk",
+                disconnected=challenge["verdict"] == "disconnected",
+                **kwargs
             )
+    except ChallengeTimeout:
+        logger.warning("'%s' - Verdict timed out.", player_name)
+        _record_outcome(
+            "timeout", challenge["player_id"], challenge["expected_answers_list"],
+            total_answer_time_secs
+        )
     except Exception as error:
-        logger.error("_process_security_question() failed : %s", error)
-
-
-def _process_security_question(item):
-    ask_security_question(**item)
+        logger.error("'%s' - Verdict couldn't be applied - %s", player_name, error)
+    finally:
+        inflight_challenges.remove(challenge["challenge_id"])
+        _context.config = _context.soft = _context.deadline = None
+        _context.player_id = _context.challenge_id = _context.stage = _context.started = None
 
 
 def still_connected(
@@ -218,41 +2400,178 @@ def still_connected(
     returns True if yes, False if no
     """
     try:
-        all_players_list = rcon.get_player_ids()  # v18
+        all_players_list = backend_call("rcon", PRIORITY_ROSTER, rcon.get_player_ids)  # v18
         for player in all_players_list:
             if player[1] == player_id:
                 return True
+    except BackendUnavailable:
+        # Can't tell : the caller will retry later
+        return True
     except Exception as error:
         logger.error("get_playerids() failed - %s", error)
     return False
 
 
+def _last_death_monotonic(player_name: str) -> Optional[float]:
+    """
+    Returns when (time.monotonic() reference) the player has been killed
+    in the last PUNISH_READINESS_RESPAWN_SECS, or None
+    """
+    now = time.time()
+    logs = backend_call(
+        "logs",
+        PRIORITY_LOGS,
+        get_recent_logs,
+        end=50,
+        player_search=player_name,
+        action_filter=["KILL", "TEAM KILL"],
+        min_timestamp=int(now) - config.PUNISH_READINESS_RESPAWN_SECS,
+        exact_player_match=True
+    )
+    deaths = [
+        log["timestamp_ms"] / 1000 for log in logs["logs"]
+        if log.get("player_name_2") == player_name
+    ]
+    if not deaths:
+        return None
+    return time.monotonic() - (now - max(deaths))
+
+
+def wait_punish_readiness(
+    rcon: Rcon,
+    player_name: str,
+    player_id: str,
+    deadline: float
+) -> Literal["ready", "gone", "timeout"]:
+    """
+    Waits until the player is likely alive on the map (can be punished)
+    - "ready" : in a team, with a role, and not killed recently
+    - "gone" : has disconnected
+    - "timeout" : deadline (time.monotonic() reference) reached
+    """
+    try:
+        died_at = _last_death_monotonic(player_name)
+    except Exception as error:
+        logger.warning("'%s' - Can't get the recent deaths - %s", player_name, error)
+        died_at = None
+    last_deaths = None
+
+    while True:
+        try:
+            info = backend_call(
+                "rcon", PRIORITY_ROSTER, rcon.get_detailed_player_info, player_name
+            )
+        except BackendUnavailable:
+            info = None
+        except Exception:
+            if not still_connected(rcon, player_id):
+                return "gone"
+            info = None
+
+        if info:
+            # The deaths counter increased : killed since the last check
+            deaths = info.get("deaths")
+            if last_deaths is not None and deaths is not None and deaths > last_deaths:
+                died_at = time.monotonic()
+            last_deaths = deaths
+
+            on_map = info.get("team") not in (None, "", "none") and info.get("role")
+            respawned = (
+                died_at is None
+                or time.monotonic() - died_at >= config.PUNISH_READINESS_RESPAWN_SECS
+            )
+            if on_map and respawned:
+                return "ready"
+
+        if time.monotonic() >= deadline:
+            return "timeout"
+        sleep(config.PUNISH_READINESS_POLL_SECS)
+
+
 def ask_security_question(
     player_name: str,
     player_id: str,
     question_sentence: str,
-    expected_answers_list: List[str]
+    expected_answers_list: List[str],
+    time_to_answer_secs: int
 ):
     """
-    Displays the question within a "punish" screen
+    Displays the question within a private message or a "punish" screen
     """
     if config.TEST_MODE:
         logger.info("(test mode) -  '%s' - Would have been tested.", player_name)
         return
 
     rcon = Rcon(SERVER_INFO)
+    delivery_start = time.monotonic()
+
+    # Private message (reaches the player in any state)
+    if config.QUESTION_DELIVERY == "message":
+        _set_stage("message")
+        try:
+            command_batcher.submit(
+                "message_player",
+                player_name=player_name,
+                player_id=player_id,
+                message=config.GENERIC_QUESTION_INTRO + question_sentence,
+                by=config.BOT_NAME
+            )
+        except Exception as error:
+            logger.warning(
+                "'%s' - Question message couldn't be sent. Using the punish screen - %s",
+                player_name, error
+            )
+        else:
+            challenge_stats.add("punish_secs", time.monotonic() - delivery_start)
+            logger.info("'%s' - Received the question (message).", player_name)
+            watch_logs(
+                rcon=rcon,
+                player_name=player_name,
+                player_id=player_id,
+                question_sentence=question_sentence,
+                expected_answers_list=expected_answers_list,
+                time_to_answer_secs=time_to_answer_secs
+            )
+            return
+
+    _set_stage("punish")
     max_punish_retries = config.MAX_PUNISH_RETRIES
     punish_success = False
+    readiness_deadline = (
+        time.monotonic() + config.MAX_PUNISH_RETRIES * config.PUNISH_RETRIES_INTERVAL
+    )
 
     while max_punish_retries >= 0:
+        if match_ended.is_set():
+            logger.info("'%s' - Map change. Will be tested in next batch.", player_name)
+            return
+
+        # Wait for the player to be on map (doesn't cost a retry)
+        if config.PUNISH_READINESS_ENABLE:
+            readiness = wait_punish_readiness(rcon, player_name, player_id, readiness_deadline)
+            if readiness == "gone":
+                report(
+                    report_mode="ghost",
+                    player_id=player_id,
+                    player_name=player_name,
+                    question_sentence=question_sentence,
+                    expected_answers_list=expected_answers_list
+                )
+                return
+            if readiness == "timeout":
+                break
+
+        _context.punish_attempts += 1
         try:
-            rcon.punish(
+            command_batcher.submit(
+                "punish",
                 player_name=player_name,
                 player_id=player_id,  # v18
                 reason=config.GENERIC_QUESTION_INTRO + question_sentence,
                 by=config.BOT_NAME
             )
             punish_success = True
+            challenge_stats.add("punish_secs", time.monotonic() - delivery_start)
             logger.info("'%s' - Saw the question.", player_name)
             break
 
@@ -266,7 +2585,10 @@ def ask_security_question(
                         player_name,
                         max_punish_retries
                     )
-                    sleep(config.PUNISH_RETRIES_INTERVAL)
+                    sleep(
+                        config.PUNISH_READINESS_POLL_SECS if config.PUNISH_READINESS_ENABLE
+                        else config.PUNISH_RETRIES_INTERVAL
+                    )
                 max_punish_retries -= 1
                 continue
 
@@ -291,7 +2613,24 @@ def ask_security_question(
         player_name=player_name,
         player_id=player_id,
         question_sentence=question_sentence,
-        expected_answers_list=expected_answers_list
+        expected_answers_list=expected_answers_list,
+        time_to_answer_secs=time_to_answer_secs
+    )
+
+
+def valid_answer(answer: str, expected_answers_list: List[str]) -> bool:
+    """
+    Returns True if a chat message is a valid answer
+    """
+    if config.ANSWER_EXACT_MATCH:
+        if not config.ANSWER_CASE_SENSITIVE:
+            return answer.upper() in [expected.upper() for expected in expected_answers_list]
+        return answer in expected_answers_list
+    flags = 0 if config.ANSWER_CASE_SENSITIVE else re.IGNORECASE
+    return any(
+        # A test started before a config reload may expect a word that has been removed since
+        config.ANSWER_PATTERNS.get(expected, re.compile(re.escape(expected), flags)).search(answer)
+        for expected in expected_answers_list
     )
 
 
@@ -300,38 +2639,69 @@ def watch_logs(
     player_name: str,
     player_id: str,
     question_sentence: str,
-    expected_answers_list: List[str]
+    expected_answers_list: List[str],
+    time_to_answer_secs: int,
+    started_at: Optional[float] = None
 ):
     """
-    Player has been punished (saw the question)
+    Player has been punished or messaged (saw the question)
     Monitor server logs for :
     - "TEAM KILL"
     - "DISCONNECTED"
     - a valid answer in "CHAT"
+    - EARLY_KICK_WRONG_ANSWERS wrong answers in "CHAT"
     """
+    _set_stage("answer")
+    original_answers_list = expected_answers_list
     if not config.ANSWER_CASE_SENSITIVE:
         expected_answers_list = [answer.upper() for answer in expected_answers_list]
     his_answers_list = []
     answered_with_tk = False
     disconnected = False
     correct_answer = False
-    start = datetime.now(timezone.utc)
+    reprompts = 0
+    reprompted_answers = 0
+    if started_at is None:
+        start = datetime.now(timezone.utc)
+    else:
+        start = datetime.fromtimestamp(started_at, timezone.utc)
     start_timestamp_int = int(start.timestamp())
+    inflight_challenges.answer_started(_context.challenge_id, start.timestamp())
+
+    # Time lost while the logs couldn't be read is given back to the player
+    # (up to time_to_answer_secs)
+    extension_secs = 0
 
     # Monitoring logs, expecting an answer in chat
-    while (datetime.now(timezone.utc) - start).total_seconds() <= config.TIME_TO_ANSWER_SEC:
+    while (
+        (datetime.now(timezone.utc) - start).total_seconds() - extension_secs
+        <= time_to_answer_secs
+    ):
+        if match_ended.is_set():
+            logger.info("'%s' - Map change. Test cancelled.", player_name)
+            _record_outcome("cancelled", player_id, expected_answers_list)
+            return
+        call_start = time.monotonic()
         try:
-            logs = get_recent_logs(
+            logs = backend_call(
+                "logs",
+                PRIORITY_LOGS,
+                get_recent_logs,
                 end=500,
                 player_search=player_name,
                 action_filter=["CHAT", "DISCONNECTED", "TEAM KILL"],
                 min_timestamp=start_timestamp_int,
                 exact_player_match=True
             )
-        except Exception:
-            logger.error("'%s' - Couldn't get the logs", player_name)
+        except Exception as error:
+            logger.error("'%s' - Couldn't get the logs - %s", player_name, error)
             sleep(5)
-            continue  # Will retry until TIME_TO_ANSWER_SEC expires
+            added_secs = min(
+                extension_secs + time.monotonic() - call_start, time_to_answer_secs
+            ) - extension_secs
+            extension_secs += added_secs
+            _extend_deadline(added_secs)
+            continue  # Will retry until time_to_answer_secs expires
 
         # Analyzing logs
         for log in logs["logs"]:
@@ -350,26 +2720,9 @@ def watch_logs(
                 if log["sub_content"] not in his_answers_list:
                     his_answers_list.append(log["sub_content"])
 
-                if config.ANSWER_EXACT_MATCH:
-                    if not config.ANSWER_CASE_SENSITIVE:
-                        if log["sub_content"].upper() in expected_answers_list:
-                            correct_answer = True
-                            break
-                    else:
-                        if log["sub_content"] in expected_answers_list:
-                            correct_answer = True
-                            break
-                else:
-                    if not config.ANSWER_CASE_SENSITIVE:
-                        for answer in expected_answers_list:
-                            if re.findall(answer, log["sub_content"], re.IGNORECASE):
-                                correct_answer = True
-                                break
-                    else:
-                        for answer in expected_answers_list:
-                            if re.findall(answer, log["sub_content"]):
-                                correct_answer = True
-                                break
+                if valid_answer(log["sub_content"], original_answers_list):
+                    correct_answer = True
+                    break
 
         # Player committed a TK
         if answered_with_tk:
@@ -389,6 +2742,7 @@ def watch_logs(
             logger.info(
                 "'%s' - Gave a valid answer in %s secs.", player_name, total_answer_time_secs
             )
+            challenge_stats.add("answer_secs", total_answer_time_secs)
             success(
                 rcon=rcon,
                 player_name=player_name,
@@ -400,6 +2754,35 @@ def watch_logs(
             )
             return
 
+        # Player gave wrong answer(s)
+        if config.EARLY_KICK_WRONG_ANSWERS > 0 and len(his_answers_list) > reprompted_answers:
+            elapsed_secs = (datetime.now(timezone.utc) - start).total_seconds()
+            if reprompts < config.EARLY_REPROMPTS:
+                reprompts += 1
+                reprompted_answers = len(his_answers_list)
+                try:
+                    command_batcher.submit(
+                        "message_player",
+                        player_name=player_name,
+                        player_id=player_id,
+                        message=config.GENERIC_QUESTION_INTRO + question_sentence,
+                        by=config.BOT_NAME
+                    )
+                except Exception as error:
+                    logger.warning("'%s' - Question can't be sent again - %s", player_name, error)
+            elif (
+                len(his_answers_list) >= config.EARLY_KICK_WRONG_ANSWERS
+                and elapsed_secs >= config.EARLY_KICK_MIN_SECS
+            ):
+                logger.info(
+                    "'%s' - Gave %s wrong answers in %s secs. Early verdict.",
+                    player_name, len(his_answers_list), int(elapsed_secs)
+                )
+                challenge_stats.add_early_verdict(
+                    time_to_answer_secs + extension_secs - elapsed_secs
+                )
+                break
+
         # Answering time isn't over. No valid response yet...
         # Sleep time to avoid a fast loop that consumes a lot of CPU time
         sleep(1)
@@ -409,6 +2792,11 @@ def watch_logs(
     # Time is up and player gave no/bad answer(s)
     if not answered_with_tk and not disconnected:
         total_answer_time_secs = int((datetime.now(timezone.utc) - start).total_seconds())
+        if match_ended.is_set():
+            logger.info("'%s' - Map change. Test cancelled.", player_name)
+            _record_outcome("cancelled", player_id, expected_answers_list, total_answer_time_secs)
+            return
+    challenge_stats.add("answer_secs", total_answer_time_secs)
 
     # Giving a default value to the answer if player didn't answered at all
     if len(his_answers_list) == 0:
@@ -442,50 +2830,24 @@ def success(
     - send Discord embed
     - send a 'success' ingame message
     """
-    # Flags player's CRCON profile
-    flag_success = False
-    retries = 3  # hardcoded
-    while retries >= 0:
-        try:
-            add_flag_to_player(
-                player_id=player_id,
-                flag=config.VERIFIED_PLAYER_FLAG,
-                comment=TRANSL['gaveavalidanswer'][config.LANG]
-            )
-        except Exception as error:
-            logger.warning(
-                "'%s' - Can't be flagged. Will retry %s time(s) - %s",
-                player_name, retries, error
-            )
-            retries = retries - 1
-            sleep(5)  # Wait for the CRCON to restore connections (?)
-            continue
-        else:
-            flag_success = True
-            break
-    # Player's CRCON profile couldn't be flagged
-    if not flag_success:
-        logger.error(
-            "\n--------------------\n|  CRITICAL ERROR  |\n--------------------\n"
-            "'%s' - Couldn't be flagged.", player_name
-        )
-        return
-
-    # Player's CRCON profile has been flagged
-
-    report(
-        report_mode="valid",
+    _set_stage("success")
+    # The verdict is known : the test can't time out anymore
+    _context.deadline = None
+
+    # Flags player's CRCON profile (in the background)
+    player_cache.add_flag(player_id, config.VERIFIED_PLAYER_FLAG)
+    write_queue.put(
+        "flag",
         player_id=player_id,
         player_name=player_name,
-        question_sentence=question_sentence,
-        expected_answers_list=expected_answers_list,
-        his_answers_list=his_answers_list,
-        total_answer_time_secs=total_answer_time_secs
+        flag=config.VERIFIED_PLAYER_FLAG,
+        comment=TRANSL['gaveavalidanswer'][config.LANG]
     )
 
     if config.SUCCESS_MESSAGE_DISPLAY:
         try:
-            rcon.message_player(
+            command_batcher.submit(
+                "message_player",
                 player_name=player_name,
                 player_id=player_id,
                 message=config.SUCCESS_MESSAGE_TEXT,
@@ -495,9 +2857,15 @@ def success(
         except Exception as error:
             logger.warning("'%s' - Success message couldn't be sent - %s", player_name, error)
 
-    # Sleep time to be sure the flag will be active on the next loop
-    # (avoids the player to be tested again)
-    sleep(5)
+    report(
+        report_mode="valid",
+        player_id=player_id,
+        player_name=player_name,
+        question_sentence=question_sentence,
+        expected_answers_list=expected_answers_list,
+        his_answers_list=his_answers_list,
+        total_answer_time_secs=total_answer_time_secs
+    )
 
 
 def failure(
@@ -516,6 +2884,23 @@ def failure(
     - Player answered with a TK : kick or blacklist
     - send Discord embed
     """
+    _set_stage("failure")
+    soft = getattr(_context, "soft", False)
+
+    # Seeding test : the player will be tested again later
+    # (a TK is still handled below, only the kick is skipped)
+    if soft and not (answered_with_tk and config.TK_ACTION == "blacklist"):
+        logger.info(
+            "'%s' - Seeding test failed%s. Not kicked. %s : '%s'",
+            player_name,
+            " (TK)" if answered_with_tk else "",
+            TRANSL['receivedanswer'][config.LANG],
+            " ; ".join(his_answers_list)
+        )
+        _record_outcome("spared", player_id, expected_answers_list, total_answer_time_secs)
+        seeding_spared.add(player_id)
+        return
+
     # Player has disconnected before the kick
     if disconnected:
         report(
@@ -532,32 +2917,45 @@ def failure(
     # Player committed a TK
     if answered_with_tk:
         if config.TK_ACTION == "blacklist":
-            try:
-                if config.TK_BLACKLIST_EXPIRATION is not None:
-                    expires_at = (
-                        datetime.now(timezone.utc) + timedelta(config.TK_BLACKLIST_EXPIRATION)
-                    )
-                else:
-                    expires_at = None
-                add_record_to_blacklist(
-                    player_id=player_id,
-                    blacklist_id=config.TK_BLACKLIST_ID,
-                    reason=config.TK_BAN_MESSAGE,
-                    expires_at=expires_at,
-                    admin_name=config.BOT_NAME
-                )
-                logger.info("'%s' - %s (until %s)", player_name, config.TK_ACTION, expires_at)
-            except Exception as error:
-                logger.error("'%s' - %s - %s", player_name, config.TK_ACTION, error)
+            if config.TK_BLACKLIST_DURATION is not None:
+                expires_at = datetime.now(timezone.utc) + config.TK_BLACKLIST_DURATION
+            else:
+                expires_at = None
+            # Written in the background : the kick below isn't delayed
+            write_queue.put(
+                "blacklist",
+                player_id=player_id,
+                player_name=player_name,
+                blacklist_id=config.TK_BLACKLIST_ID,
+                reason=config.TK_BAN_MESSAGE,
+                expires_at=expires_at.isoformat() if expires_at else None,
+                admin_name=config.BOT_NAME
+            )
+            logger.info("'%s' - %s (until %s)", player_name, config.TK_ACTION, expires_at)
         elif config.TK_ACTION == "kickonly":
             logger.info("'%s' - %s", player_name, config.TK_ACTION)
 
+    # Seeding test : blacklisted, not kicked
+    if soft:
+        report(
+            report_mode="kick",
+            player_id=player_id,
+            player_name=player_name,
+            question_sentence=question_sentence,
+            expected_answers_list=expected_answers_list,
+            his_answers_list=his_answers_list,
+            total_answer_time_secs=total_answer_time_secs
+        )
+        return
+
     # Player didn't give the right answer
     kick_success = False
+    kick_start = time.monotonic()
     retries = 3  # hardcoded
     while retries >= 0:
         try:
-            rcon.kick(
+            command_batcher.submit(
+                "kick",
                 player_name=player_name,
                 reason=config.KICK_MESSAGE_TEXT,
                 by=config.BOT_NAME,
@@ -588,6 +2986,7 @@ def failure(
             return
 
         kick_success = True
+        challenge_stats.add("kick_secs", time.monotonic() - kick_start)
         break
 
     # Kick failed 3 times, player is still connected
@@ -623,6 +3022,9 @@ def report(
     """
     Sends Discord embed (ghost/coward/valid/kicked)
     """
+    # The verdict is known : the test can't time out anymore
+    _context.deadline = None
+
     if report_mode == "ghost":
         comment = TRANSL['disconnectedbeforetest'][config.LANG]
         embed_display = config.DISCORD_GHOST_EMBED_DISPLAY
@@ -644,6 +3046,9 @@ def report(
         emoji = config.VERIFIED_PLAYER_FLAG_EMBED
         embed_color = config.DISCORD_VALID_EMBED_COLOR
 
+    _record_outcome(report_mode, player_id, expected_answers_list, total_answer_time_secs)
+    _remember_outcome(report_mode, player_id, player_name)
+
     # "ghost" default
     if len(his_answers_list) == 0:
         his_answers_list.append(TRANSL['blank'][config.LANG])
@@ -658,11 +3063,17 @@ def report(
         " ; ".join(his_answers_list)
     )
 
+    if config.USE_DISCORD and config.DISCORD_DIGEST_ENABLE:
+        discord_digest.add(report_mode, player_id, player_name, total_answer_time_secs)
+        embed_display = (
+            embed_display and report_mode == "kick" and config.DISCORD_DIGEST_KICK_EMBEDS
+        )
+
     if config.USE_DISCORD and embed_display:
         prepare_discord_embed(
             embed_title=player_name,
-            embed_title_url=common_functions.get_external_profile_url(player_id, player_name),
-            avatar_url=common_functions.get_avatar_url(player_id),
+            embed_title_url=profile_url(player_id, player_name),
+            avatar_url=avatar_url(player_id),
             embed_desc_txt=question_sentence,
             embed_color=embed_color,
             embed_answer_expected="\n".join(expected_answers_list),
@@ -672,6 +3083,217 @@ def report(
         )
 
 
+def _shared_outcome(player_id: str) -> Optional[str]:
+    """
+    Returns the player's last outcome on this host's game servers
+    (failures are forgotten after REJOIN_MEMORY_HOURS)
+    """
+    try:
+        record = shared_ids.get(player_id)
+    except OSError as error:
+        logger.error("Shared ids - Can't be read - %s", error)
+        return None
+    if record is None:
+        return None
+    outcome, timestamp = record
+    if outcome != "valid" and time.time() - timestamp > config.REJOIN_MEMORY_HOURS * 3600:
+        return None
+    return outcome
+
+
+def _remember_outcome(report_mode: str, player_id: str, player_name: str):
+    """
+    Remembers the failed tests, to handle the players faster when they come back,
+    and blacklists the ones who failed REJOIN_BLACKLIST_AFTER times
+    """
+    if config.SHARED_IDS_ENABLE and report_mode in ("valid", "kick", "coward"):
+        try:
+            shared_ids.put(player_id, report_mode)
+        except OSError as error:
+            logger.error("Shared ids - Can't be written - %s", error)
+    if report_mode == "valid":
+        recent_outcomes.forget(player_id)
+        return
+    record = recent_outcomes.add(player_id, report_mode)
+    if (
+        config.REJOIN_BLACKLIST_AFTER > 0
+        and report_mode in ("kick", "coward")
+        and record["failures"] >= config.REJOIN_BLACKLIST_AFTER
+    ):
+        if config.REJOIN_BLACKLIST_DURATION is not None:
+            expires_at = datetime.now(timezone.utc) + config.REJOIN_BLACKLIST_DURATION
+        else:
+            expires_at = None
+        write_queue.put(
+            "blacklist",
+            player_id=player_id,
+            player_name=player_name,
+            blacklist_id=config.TK_BLACKLIST_ID,
+            reason=config.KICK_MESSAGE_TEXT,
+            expires_at=expires_at.isoformat() if expires_at else None,
+            admin_name=config.BOT_NAME
+        )
+        logger.info(
+            "'%s' - Failed %s tests - blacklisted (until %s)",
+            player_name, record["failures"], expires_at
+        )
+        recent_outcomes.forget(player_id)
+
+
+def _record_outcome(
+    outcome: str,
+    player_id: str,
+    expected_answers_list: List[str],
+    total_answer_time_secs: int = 0
+):
+    """
+    Appends the test outcome to the outcomes store
+    """
+    try:
+        outcome_store.append(
+            outcome=outcome,
+            player_id=player_id,
+            word=expected_answers_list[0] if expected_answers_list else "",
+            started=getattr(_context, "started_at", None) or time.time(),
+            ended=time.time(),
+            punish_attempts=getattr(_context, "punish_attempts", None) or 0,
+            answer_secs=total_answer_time_secs
+        )
+    except Exception as error:
+        logger.error("'%s' - Outcome couldn't be recorded - %s", player_id, error)
+
+
+def _discord_webhook_url() -> Optional[str]:
+    """
+    Returns this game server's webhook URL, or None if disabled
+    """
+    server_number = int(get_server_number())
+    if not config.SERVER_CONFIG[server_number - 1][1]:
+        return None
+    return config.SERVER_CONFIG[server_number - 1][0]
+
+
+class DiscordDigest:
+    """
+    Buffers the tests outcomes and posts a single summary embed
+    every DISCORD_DIGEST_INTERVAL_MINS or DISCORD_DIGEST_MAX_EVENTS outcomes
+    """
+    # Kicked players listed in a digest (an embed field is limited to 1024 chars)
+    MAX_LISTED_KICKS = 10
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._events = []
+        self._since = time.time()
+        self._thread = None
+
+    def add(self, report_mode: str, player_id: str, player_name: str, answer_secs: int):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="discord_digest", daemon=True
+                )
+                self._thread.start()
+            self._events.append({
+                "mode": report_mode,
+                "player_name": player_name,
+                "profile_url": profile_url(player_id, player_name),
+                "answer_secs": answer_secs
+            })
+            if len(self._events) >= config.DISCORD_DIGEST_MAX_EVENTS:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._events) >= config.DISCORD_DIGEST_MAX_EVENTS,
+                    timeout=self._since + config.DISCORD_DIGEST_INTERVAL_MINS * 60 - time.time()
+                )
+                events, self._events = self._events, []
+                since, self._since = self._since, time.time()
+            if events:
+                try:
+                    self.send(events, since)
+                except Exception as error:
+                    logger.error("Discord digest - %s outcome(s) not sent - %s", len(events), error)
+
+    def flush(self):
+        """
+        Sends the buffered outcomes now
+        """
+        with self._cond:
+            events, self._events = self._events, []
+            since, self._since = self._since, time.time()
+        if events:
+            try:
+                self.send(events, since)
+            except Exception as error:
+                logger.error("Discord digest - %s outcome(s) not sent - %s", len(events), error)
+
+    def send(self, events: List[dict], since: float):
+        """
+        Posts a digest embed
+        """
+        discord_webhook = _discord_webhook_url()
+        if discord_webhook is None:
+            return
+        counts = Counter(event["mode"] for event in events)
+        labels = {
+            "valid": (config.VERIFIED_PLAYER_FLAG_EMBED, TRANSL['flaggedvalid'][config.LANG]),
+            "kick": (config.DISCORD_KICK_EMOJI, TRANSL['hasbeenkicked'][config.LANG]),
+            "coward": (config.DISCORD_COWARD_EMOJI, TRANSL['disconnectedbeforekick'][config.LANG]),
+            "ghost": (config.DISCORD_GHOST_EMOJI, TRANSL['disconnectedbeforetest'][config.LANG]),
+        }
+        embed = discord.Embed(
+            title=f"{len(events)} test(s)",
+            description="\n".join(
+                f"{emoji} {counts[mode]} - {label}"
+                for mode, (emoji, label) in labels.items() if counts[mode]
+            ),
+            color=(
+                config.DISCORD_KICK_EMBED_COLOR if counts["kick"]
+                else config.DISCORD_VALID_EMBED_COLOR
+            )
+        )
+        embed.set_author(
+            name=config.BOT_NAME,
+            url=common_functions.DISCORD_EMBED_AUTHOR_URL,
+            icon_url=common_functions.DISCORD_EMBED_AUTHOR_ICON_URL
+        )
+
+        kicked = [event for event in events if event["mode"] == "kick"]
+        if kicked:
+            lines = [
+                f"[{discord.utils.escape_markdown(event['player_name'])}]"
+                f"({event['profile_url']}) - {event['answer_secs']}s"
+                for event in kicked[:self.MAX_LISTED_KICKS]
+            ]
+            if len(kicked) > self.MAX_LISTED_KICKS:
+                lines.append(f"+ {len(kicked) - self.MAX_LISTED_KICKS}")
+            embed.add_field(
+                name=TRANSL['hasbeenkicked'][config.LANG], value="\n".join(lines)[:1024]
+            )
+
+        answer_secs = sorted(event["answer_secs"] for event in events if event["mode"] == "valid")
+        if answer_secs:
+            embed.add_field(
+                name=TRANSL['processingtime'][config.LANG].rstrip(" :"),
+                value=(
+                    f"p50 : {answer_secs[len(answer_secs) // 2]}s - "
+                    f"p90 : {answer_secs[min(len(answer_secs) * 9 // 10, len(answer_secs) - 1)]}s"
+                    f" - max : {answer_secs[-1]}s"
+                )
+            )
+        embed.set_footer(
+            text=f"{datetime.fromtimestamp(since, timezone.utc):%H:%M} - "
+            f"{datetime.now(timezone.utc):%H:%M} UTC"
+        )
+
+        webhook = discord.SyncWebhook.from_url(discord_webhook)
+        backend_call("discord", None, common_functions.discord_embed_send, embed, webhook)
+
+
 def prepare_discord_embed(
     embed_title: str,
     embed_title_url: str,
@@ -687,10 +3309,9 @@ def prepare_discord_embed(
     Sends an embed message to Discord
     """
     # Check if enabled
-    server_number = int(get_server_number())
-    if not config.SERVER_CONFIG[server_number - 1][1]:
+    discord_webhook = _discord_webhook_url()
+    if discord_webhook is None:
         return
-    discord_webhook = config.SERVER_CONFIG[server_number - 1][0]
 
     # Create and send Discord embed
     webhook = discord.SyncWebhook.from_url(discord_webhook)
@@ -723,7 +3344,42 @@ def prepare_discord_embed(
     if config.DISCORD_EMBED_FOOTER_DISPLAY:
         embed.set_footer(text=embed_footer_txt)
 
-    common_functions.discord_embed_send(embed, webhook)
+    try:
+        backend_call("discord", None, common_functions.discord_embed_send, embed, webhook)
+    except BackendUnavailable:
+        logger.warning("'%s' - Discord is unavailable. Embed not sent.", embed_title)
+
+
+# Signals
+# -----------------------------------------------------------------------------
+
+def _profiling_signal(signum, frame):  # pylint: disable=unused-argument
+    """
+    SIGUSR1 : threads stacks and memory snapshot
+    SIGUSR2 : CPU profile
+    (the reports are written by a background thread)
+    """
+    if signum == signal.SIGUSR1:
+        def snapshot():
+            profiler.dump_threads()
+            profiler.memory_snapshot()
+        threading.Thread(target=snapshot, name="profiler", daemon=True).start()
+    else:
+        profiler.start_cpu_profile(config.PROFILING_CPU_SECS, config.PROFILING_SAMPLE_MS / 1000)
+
+
+def _sigterm(signum, frame):  # pylint: disable=unused-argument
+    """
+    supervisord stops the plugin with SIGTERM :
+    gives the HA lease away (the standby instance takes over at once),
+    sends the buffered Discord outcomes, then exits through sys.exit()
+    so the atexit handlers (logging listener) are run
+    """
+    logger.info("Stopping (signal %s)", signum)
+    if leader_elector is not None:
+        leader_elector.stop()
+    discord_digest.flush()
+    sys.exit(0)
 
 
 # Launching - initial pause : wait to be sure the CRCON is fully started
@@ -731,6 +3387,61 @@ sleep(60)
 
 logger = logging.getLogger('rcon')
 
+# Per-thread state (configuration snapshot in use, current test)
+_context = threading.local()
+config = _ConfigProxy()
+_config_reload_lock = threading.Lock()
+_config_mtime = os.stat(config_module.__file__).st_mtime
+_current_config = compile_config(config_module)
+
+_setup_logging()
+
+call_governor = CallGovernor()
+backend_executor = BackendExecutor(BACKEND_CALL_WORKERS)
+command_batcher = CommandBatcher()
+circuit_breakers = {
+    name: CircuitBreaker(name) for name in ("rcon", "logs", "db", "discord", "steam")
+}
+player_cache = PlayerCache()
+profile_prefetcher = ProfilePrefetcher()
+discord_digest = DiscordDigest()
+
+challenge_stats = ChallengeStats(CHALLENGE_STATS_HISTORY)
+outcome_store = OutcomeStore(outcomes_file_path(config.DATA_DIR, get_server_number()))
+verified_index = VerifiedIndex(verified_index_path(config.DATA_DIR, get_server_number()))
+shared_ids = SharedIdSet(shared_ids_file_path(config.DATA_DIR), config.SHARED_IDS_CAPACITY)
+steam_countries = SteamCountryResolver(
+    os.path.join(
+        config.DATA_DIR, f"language_doorkeeper_steam_countries_{get_server_number()}.json"
+    ),
+    config,
+    functools.partial(backend_call, "steam", None),
+    _atomic_json_dump
+)
+profiler = Profiler(
+    os.path.join(config.DATA_DIR, "language_doorkeeper_profiles"), str(get_server_number())
+)
+inflight_challenges = InFlightChallenges(
+    os.path.join(config.DATA_DIR, f"language_doorkeeper_inflight_{get_server_number()}.json")
+)
+leader_elector = (
+    LeaderElector(_make_lease(), config.HA_LEASE_SECS, on_lost=_leadership_lost)
+    if config.HA_ENABLE else None
+)
+recent_outcomes = RecentOutcomes(
+    os.path.join(
+        config.DATA_DIR, f"language_doorkeeper_recent_outcomes_{get_server_number()}.json"
+    )
+)
+match_ended = threading.Event()
+seeding_spared = set()
+
+write_queue = WriteBehindQueue(
+    os.path.join(
+        config.DATA_DIR, f"language_doorkeeper_write_queue_{get_server_number()}.json"
+    )
+)
+
 logger.info(
     "\n-------------------------------------------------------------------------------\n"
     "%s (started)\n"
@@ -746,6 +3457,33 @@ if config.TEST_MODE:
 
 # Launching (infinite loop)
 if __name__ == "__main__":
+    threading.Thread(target=_watch_config_file, name="config_watcher", daemon=True).start()
+    signal.signal(signal.SIGTERM, _sigterm)
+    signal.signal(signal.SIGHUP, lambda signum, frame: reload_config())
+    signal.signal(signal.SIGUSR1, _profiling_signal)
+    signal.signal(signal.SIGUSR2, _profiling_signal)
+    threading.Thread(target=write_queue.run, name="write_queue", daemon=True).start()
+    threading.Thread(target=profile_prefetcher.run, name="prefetch", daemon=True).start()
+    if leader_elector is None:
+        while True:
+            try:
+                should_we_run()
+            except Exception as error:
+                logger.error("should_we_run() failed - %s", error)
+            sleep(config.WATCH_INTERVAL_SECS)
+    leader_elector.start()
     while True:
-        should_we_run()
-        sleep(config.WATCH_INTERVAL_SECS)
+        # Standby : wait for the lease
+        if not leader_elector.wait_for_leadership(config.WATCH_INTERVAL_SECS):
+            keep_warm()
+            continue
+        try:
+            resume_challenges()
+        except Exception as error:
+            logger.error("resume_challenges() failed - %s", error)
+        while leader_elector.is_leader():
+            try:
+                should_we_run()
+            except Exception as error:
+                logger.error("should_we_run() failed - %s", error)
+            sleep(config.WATCH_INTERVAL_SECS)
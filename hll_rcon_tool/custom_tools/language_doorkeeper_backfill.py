@@ -0,0 +1,223 @@
+"""
+language_doorkeeper_backfill.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+Offline job that pre-verifies the known players from CRCON's players history,
+using the same exemptions as the live plugin (Steam country, pseudo, CRCON flags).
+The verified players never enter the live tests pipeline.
+
+Usage (from /root/hll_rcon_tool) :
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_backfill --dry-run
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_backfill
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_backfill --write flags
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Optional
+
+
+# Players read from the database per query
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def verified_index_path(data_dir: str, server_number) -> str:
+    """
+    Returns the verified players index file path for a game server
+    """
+    return os.path.join(data_dir, f"language_doorkeeper_verified_{server_number}.txt")
+
+
+def load_verified_index(path: str) -> frozenset:
+    """
+    Reads the verified players index (one player_id per line)
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            return frozenset(line.strip() for line in file if line.strip())
+    except FileNotFoundError:
+        return frozenset()
+
+
+def save_verified_index(path: str, player_ids):
+    """
+    Writes the verified players index (atomic replace)
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        for player_id in sorted(player_ids):
+            file.write(f"{player_id}\n")
+    os.replace(tmp_path, path)
+
+
+def iter_history_chunks(chunk_size: int):
+    """
+    Streams the players history, chunk_size players at a time (ordered by database id),
+    as (ids, player_ids, countries, name_owners, names, flag_owners, flags) tuples
+    - names : the last name used by each player
+    - flags : all the CRCON flags of the players
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from rcon.models import PlayerFlag, PlayerID, PlayerName, SteamInfo, enter_session
+
+    last_id = 0
+    with enter_session() as session:
+        while True:
+            rows = (
+                session.query(PlayerID.id, PlayerID.player_id, SteamInfo.country)
+                .outerjoin(SteamInfo, SteamInfo.playersteamid_id == PlayerID.id)
+                .filter(PlayerID.id > last_id)
+                .order_by(PlayerID.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not rows:
+                return
+            first_id, last_id = rows[0][0], rows[-1][0]
+
+            names = (
+                session.query(PlayerName.playersteamid_id, PlayerName.name)
+                .filter(PlayerName.playersteamid_id.between(first_id, last_id))
+                .order_by(PlayerName.playersteamid_id, PlayerName.last_seen.desc())
+                .distinct(PlayerName.playersteamid_id)
+                .all()
+            )
+            flags = (
+                session.query(PlayerFlag.playersteamid_id, PlayerFlag.flag)
+                .filter(PlayerFlag.playersteamid_id.between(first_id, last_id))
+                .all()
+            )
+
+            ids, player_ids, countries = zip(*rows)
+            name_owners, name_values = zip(*names) if names else ((), ())
+            flag_owners, flag_values = zip(*flags) if flags else ((), ())
+            yield (
+                np.array(ids, dtype=np.int64),
+                np.array(player_ids, dtype=object),
+                np.array(countries, dtype=object),
+                np.array(name_owners, dtype=np.int64),
+                np.array(name_values, dtype=object),
+                np.array(flag_owners, dtype=np.int64),
+                np.array(flag_values, dtype=object),
+            )
+
+
+def evaluate_chunk(chunk, config) -> tuple:
+    """
+    Applies the live plugin exemptions to a chunk of players
+    Returns (player_ids to verify, already trusted players count)
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    ids, player_ids, countries, name_owners, names, flag_owners, flags = chunk
+
+    # Players already trusted by a CRCON flag don't need anything
+    trusted_owners = flag_owners[
+        np.isin(flags, list(config.WHITELIST_CRCON_EMOJI_FLAGS))
+    ]
+    trusted = np.isin(ids, trusted_owners)
+
+    exempt = np.zeros(len(ids), dtype=bool)
+
+    # Whitelisted country on Steam profile
+    if config.WHITELIST_STEAM_COUNTRY:
+        exempt |= np.isin(countries, list(config.WHITELIST_STEAM_COUNTRIES))
+
+    # Pseudo contains a pattern
+    if config.WHITELIST_PSEUDO_ENABLE and len(names):
+        pattern = re.compile(config.WHITELIST_PSEUDO_REGEX, re.IGNORECASE)
+        matching = np.fromiter(
+            (pattern.search(name) is not None for name in names),
+            dtype=bool,
+            count=len(names)
+        )
+        exempt |= np.isin(ids, name_owners[matching])
+
+    return player_ids[exempt & ~trusted], int(trusted.sum())
+
+
+def write_flags(player_ids, flag: str, comments: Optional[dict] = None) -> set:
+    """
+    Adds a flag to the players CRCON profiles, in a single query
+    (the existing flags are left untouched)
+    - comments : {player_id: flag comment}
+    Returns the player_ids found in the database
+    """
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import select
+    from sqlalchemy.dialects.postgresql import insert
+    from rcon.models import PlayerFlag, PlayerID, enter_session
+
+    comments = comments or {}
+    found = set()
+    with enter_session() as session:
+        ids = select(PlayerID.id, PlayerID.player_id).where(
+            PlayerID.player_id.in_(list(player_ids))
+        )
+        rows = []
+        for row in session.execute(ids):
+            found.add(row[1])
+            rows.append(
+                {"playersteamid_id": row[0], "flag": flag, "comment": comments.get(row[1])}
+            )
+        if rows:
+            session.execute(insert(PlayerFlag).values(rows).on_conflict_do_nothing())
+            session.commit()
+    return found
+
+
+def main():
+    """
+    Command line tool
+    """
+    # pylint: disable=import-outside-toplevel
+    from rcon.utils import get_server_number
+    import custom_tools.language_doorkeeper_config as config
+
+    parser = argparse.ArgumentParser(
+        description="language_doorkeeper players history backfill"
+    )
+    parser.add_argument(
+        "--write",
+        choices=("index", "flags"),
+        default="index",
+        help="local verified index (default), or VERIFIED_PLAYER_FLAG on CRCON profiles"
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count the players")
+    args = parser.parse_args()
+
+    start = time.monotonic()
+    scanned = trusted = 0
+    verified = []
+    for chunk in iter_history_chunks(args.chunk_size):
+        to_verify, chunk_trusted = evaluate_chunk(chunk, config)
+        scanned += len(chunk[0])
+        trusted += chunk_trusted
+        verified.extend(to_verify)
+        if args.write == "flags" and not args.dry_run and len(to_verify):
+            write_flags(to_verify, config.VERIFIED_PLAYER_FLAG)
+        print(f"{scanned} players scanned...", end="\r")
+
+    if args.write == "index" and not args.dry_run:
+        path = verified_index_path(config.DATA_DIR, get_server_number())
+        save_verified_index(path, load_verified_index(path).union(verified))
+
+    print(
+        f"{scanned} players scanned in {time.monotonic() - start:.1f} secs - "
+        f"already trusted (CRCON flag) : {trusted} - "
+        f"{'to verify' if args.dry_run else 'verified'} : {len(verified)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
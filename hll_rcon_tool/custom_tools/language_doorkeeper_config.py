@@ -392,3 +392,305 @@ MAX_PUNISH_RETRIES = 3
 # Recommended : no more than 10, as it will delay the next batch
 # Default : 10
 PUNISH_RETRIES_INTERVAL = 10
+
+# Folder where the plugin keeps its data files (pending writes, history, ...)
+# Note : the server number will be added to the files names
+# Note : a restart is required to apply a change to this setting
+# Default : "/logs" (CRCON logs folder, survives restarts)
+DATA_DIR = "/logs"
+
+# Flags and blacklist records are written to CRCON database in the background.
+# Pending writes are saved in DATA_DIR and resumed after a restart.
+# Interval (seconds) between two writes of the pending records
+# Default : 2
+WRITE_QUEUE_FLUSH_INTERVAL_SECS = 2
+
+# Waiting time (seconds) before retrying a failed write.
+# Doubled after each failure, up to WRITE_QUEUE_MAX_RETRY_DELAY_SECS
+# Default : 5
+WRITE_QUEUE_RETRY_DELAY_SECS = 5
+
+# Default : 300
+WRITE_QUEUE_MAX_RETRY_DELAY_SECS = 300
+
+# A write is given up after X failed attempts
+# Default : 10
+WRITE_QUEUE_MAX_ATTEMPTS = 10
+
+# True : only the connected players ids and names are fetched every turn,
+#        the CRCON profiles (flags, playtime, country) being loaded for new players only
+# False : all the connected players CRCON profiles are loaded every turn
+#         (heavy load on CRCON database)
+# Default : True
+LIGHT_ROSTER_ENABLE = True
+
+# Time (seconds) a loaded CRCON profile is kept before being loaded again
+# Default : 600
+PROFILE_CACHE_TTL_SECS = 600
+
+# Don't start a test if it's unlikely to end before the end of the game
+# (the player would be kicked during the scoreboard or the map change).
+# The test duration is estimated from the previous tests durations
+# (punish retries, answering time, kick time), using this percentile.
+# Default : 95
+ADMISSION_PERCENTILE = 95
+
+# Extra time (seconds) required between the estimated end of a test and the end of the game
+# Default : 30
+ADMISSION_MARGIN_SECS = 30
+
+# Also write the logs in DATA_DIR as JSON lines (one JSON object per line),
+# with the player_id, test id, test stage and elapsed time as separate fields.
+# Note : a restart is required to apply a change to this setting
+# Default : False
+LOG_JSON_ENABLE = False
+
+# Maximum number of RCON/database calls per second made by this plugin,
+# to leave enough game server capacity to CRCON (autosettings, stats, admin UI)
+# When the budget is exhausted, kicks and punishes are served first,
+# then the players list checks, then the logs polls.
+# 0 : no limit
+# Default : 10
+RCON_CALLS_PER_SEC = 10
+
+# Number of calls that can be made at once, after a quiet period
+# Default : 20
+RCON_CALLS_BURST = 20
+
+# Circuit breakers
+# When a backend (RCON, logs, CRCON database, Discord) fails X times in a row,
+# it isn't called anymore during CIRCUIT_BREAKER_COOLDOWN_SECS,
+# then a single probe call is made to check if it's back.
+# No new test is started while the RCON, logs or database backend is unavailable,
+# and the answering time of the tests in progress is extended (up to TIME_TO_ANSWER_SEC).
+# Default : 5
+CIRCUIT_BREAKER_FAILURES = 5
+
+# Default : 30
+CIRCUIT_BREAKER_COOLDOWN_SECS = 30
+
+# Punish, message and kick commands issued within this time window (milliseconds)
+# are sent together, concurrently, over a single shared RCON connection.
+# Trades latency for fewer connections : every command waits up to this window
+# before being sent.
+# 0 : disabled (each test sends its own commands)
+# Default : 0
+COMMAND_BATCH_WINDOW_MS = 0
+
+# Passive language identification
+# Players who recently chatted in your language (see LANG) are verified without being tested.
+# Their chat lines are compared to language profiles built from
+# a short sample text of each language (english, french, german, spanish).
+# Hint : enable TEST_MODE first to see in logs who would have been verified.
+# Default : False
+LANGUAGE_ID_ENABLE = False
+
+# Chat history (seconds) analyzed
+# Default : 1800
+LANGUAGE_ID_LOOKBACK_SECS = 1800
+
+# Minimum number of letters written in chat to identify the language
+# Default : 40
+LANGUAGE_ID_MIN_LETTERS = 40
+
+# Minimum similarity (0 to 1) between the chat and your language profile
+# Default : 0.15
+LANGUAGE_ID_MIN_SCORE = 0.15
+
+# Minimum similarity difference between your language and any other one
+# Default : 0.07
+LANGUAGE_ID_MIN_MARGIN = 0.07
+
+# Only punish the player when he's likely alive on the map
+# (in a team, with a role, and not killed in the last PUNISH_READINESS_RESPAWN_SECS),
+# instead of blindly retrying the punish every PUNISH_RETRIES_INTERVAL.
+# Waiting for the player doesn't cost a punish retry.
+# The total waiting time is MAX_PUNISH_RETRIES * PUNISH_RETRIES_INTERVAL.
+# Default : True
+PUNISH_READINESS_ENABLE = True
+
+# Time (seconds) a killed player is expected to stay on the deploy screen
+# Default : 20
+PUNISH_READINESS_RESPAWN_SECS = 20
+
+# Interval (seconds) between two checks of the player's state
+# Default : 3
+PUNISH_READINESS_POLL_SECS = 3
+
+# How the question is shown to the player
+# "punish" : on a punish screen (the player must be alive on the map : see the retries below)
+# "message" : in a private message, that reaches the player in any state (lobby, deploy screen)
+#             The punish screen is only used if the message can't be sent.
+# Default : "punish"
+QUESTION_DELIVERY = "punish"
+
+# Players who recently failed a test (kicked, or disconnected during the test)
+# are remembered during X hours, to handle them faster when they come back
+# 0 : disabled
+# Default : 24
+REJOIN_MEMORY_HOURS = 24
+
+# Test them as soon as they reconnect (no 60 secs grace period)
+# and before the other players
+# Default : False
+REJOIN_SKIP_GRACE = False
+
+# Time (seconds) they have to enter the expected word in chat
+# 0 : TIME_TO_ANSWER_SEC
+# Default : 0
+REJOIN_TIME_TO_ANSWER_SEC = 0
+
+# Blacklist them after X failed tests (in TK_BLACKLIST_ID, with the KICK_MESSAGE_TEXT)
+# 0 : never
+# Default : 0
+REJOIN_BLACKLIST_AFTER = 0
+
+# Blacklist duration
+# ie : "hours=2" or "days=7"
+# Default : "days=1"
+REJOIN_BLACKLIST_EXPIRATION = "days=1"
+
+# Load the CRCON profile, VIP status and profile links of the players
+# as soon as they connect, so they're ready when they are tested
+# Default : True
+PREFETCH_ENABLE = True
+
+# Time (seconds) between two checks of the new connections in the logs
+# Default : 5
+PREFETCH_POLL_SECS = 5
+
+# Share the players outcomes (verified, kicked) between the game servers
+# of this host, so a player verified on one of them isn't tested on the others
+# Default : False
+SHARED_IDS_ENABLE = False
+
+# Maximum number of players remembered (the oldest ones are forgotten first)
+# 16 bytes per player
+# Note : a restart is required to apply a change to this setting
+# Default : 262144
+SHARED_IDS_CAPACITY = 262144
+
+# Resolve the missing Steam profiles countries (WHITELIST_STEAM_COUNTRY)
+# with Steam API, 100 players per request
+# Default : True
+STEAM_COUNTRY_RESOLVE_ENABLE = True
+
+# Steam API key
+# "" : the one set in CRCON settings
+# Default : ""
+STEAM_API_KEY = ""
+
+# Steam API GetPlayerSummaries URL
+# Default : "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
+STEAM_API_URL = "https://api.steampowered.com/ISteamUser/GetPlayerSummaries/v2/"
+
+# Resolved countries are kept during X hours
+# Default : 168
+STEAM_COUNTRY_CACHE_HOURS = 168
+
+# Don't wait for the end of TIME_TO_ANSWER_SEC to kick a player
+# who already gave X different wrong answers
+# 0 : disabled
+# Default : 0
+EARLY_KICK_WRONG_ANSWERS = 0
+
+# The question is sent again (private message) after a wrong answer,
+# up to X times
+# Default : 1
+EARLY_REPROMPTS = 1
+
+# The player can't be kicked before X seconds of answering time
+# Default : 20
+EARLY_KICK_MIN_SECS = 20
+
+# Profiling (see README)
+# Duration (seconds) of a CPU profile (SIGUSR2)
+# Default : 30
+PROFILING_CPU_SECS = 30
+
+# Time (milliseconds) between two CPU profile samples
+# Default : 10
+PROFILING_SAMPLE_MS = 10
+
+# Seeding : while there's no more than DONT_KICK_BELOW players,
+# test up to X players at a time, so less of them remain to be tested later
+# These players are never kicked : the ones who fail will be tested again
+# 0 : disabled
+# Default : 0
+SEEDING_PLAYERS_TO_CHECK = 0
+
+# Discord digest : instead of one embed per test, post a summary
+# (outcomes counts, kicked players, answering times) every X minutes
+# or every X outcomes, whichever comes first
+# Default : False
+DISCORD_DIGEST_ENABLE = False
+DISCORD_DIGEST_INTERVAL_MINS = 10
+DISCORD_DIGEST_MAX_EVENTS = 50
+
+# Digest : still send an embed for each kicked player
+# Default : False
+DISCORD_DIGEST_KICK_EMBEDS = False
+
+# Maximum time (seconds) a single RCON/logs/database/Discord call can take
+# (the calls that don't answer in time are abandoned)
+# Default : 15
+BACKEND_CALL_TIMEOUT_SECS = 15
+
+# Maximum time (seconds) a test can take, from the question to the kick
+# The tests exceeding it are abandoned ("timeout" outcome)
+# 0 : punish retries time + answering time + 60 secs
+# Default : 0
+CHALLENGE_TIMEOUT_SECS = 0
+
+# High availability : run a second instance of the plugin (another supervisord program)
+# Only the active one tests the players, the other one takes over within seconds
+# if the active one stops, including the tests in progress
+# (this setting requires a restart)
+# Default : False
+HA_ENABLE = False
+
+# Where the active instance lease is stored : "file" (DATA_DIR) or "redis"
+# Note : a restart is required to apply a change to this setting
+# Default : "file"
+HA_LEASE_BACKEND = "file"
+
+# Redis URL ("" : CRCON's Redis)
+# Note : a restart is required to apply a change to this setting
+# Default : ""
+HA_REDIS_URL = ""
+
+# Lease duration (seconds) : the standby instance takes over after this delay
+# Note : a restart is required to apply a change to this setting
+# Default : 10
+HA_LEASE_SECS = 10
+
+# Trust score (0-100), computed from the players CRCON history :
+# playtime and sessions on this server, names changes, admins penalties,
+# previous failed tests and recent chat language (see LANGUAGE_ID_ENABLE)
+# The players with the lowest scores are tested first
+# Default : True
+TRUST_SCORE_ENABLE = True
+
+# Players with at least this score aren't tested
+# ie : 50 hours played, 50 sessions and no more than 2 names gives 80
+# 0 : disabled
+# Default : 0
+TRUST_EXEMPT_SCORE = 0
+
+# Broadcast : when many players join at once, all of them are tested together.
+# Every one gets its own word in a private message (whatever QUESTION_DELIVERY is),
+# all the answers are read from the same logs within a single answer window,
+# then the verdicts (flags, kicks) are applied together.
+# MAX_PLAYERS_TO_CHECK doesn't apply to the broadcasts.
+# (no reprompt nor early verdict : see EARLY_KICK_WRONG_ANSWERS)
+# Default : False
+BROADCAST_ENABLE = False
+
+# Minimum number of players to test for a broadcast (a regular batch is used below)
+# Default : 6
+BROADCAST_MIN_PLAYERS = 6
+
+# Maximum number of players tested in a broadcast
+# (can't be more than the number of words in FIRST_WORDS_LIST)
+# Default : 50
+BROADCAST_MAX_PLAYERS = 50
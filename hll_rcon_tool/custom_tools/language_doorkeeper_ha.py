@@ -0,0 +1,152 @@
+"""
+language_doorkeeper_ha.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+Active/standby : two plugin instances run for the same game server,
+only the one holding the lease (the leader) tests the players.
+The lease is stored in Redis or in a local lock file.
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger('rcon')
+
+
+class FileLease:
+    """
+    Lease stored in a JSON file {"holder": ..., "expires": ...},
+    updated under an exclusive file lock
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def _update(self, holder: str, lease_secs: float, release: bool = False) -> bool:
+        with open(self.path, "a+", encoding="utf-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                try:
+                    lease = json.loads(file.read() or "{}")
+                except ValueError:
+                    lease = {}
+                now = time.time()
+                if lease.get("holder") != holder and lease.get("expires", 0) > now:
+                    return False
+                if release:
+                    lease = {}
+                else:
+                    lease = {"holder": holder, "expires": now + lease_secs}
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(lease))
+                file.flush()
+                return True
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def acquire(self, holder: str, lease_secs: float) -> bool:
+        """
+        Takes or renews the lease. Returns True if held.
+        """
+        return self._update(holder, lease_secs)
+
+    def release(self, holder: str):
+        self._update(holder, 0, release=True)
+
+
+class RedisLease:
+    """
+    Lease stored in a Redis key (SET NX PX, renewed only by its holder)
+    """
+    RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, client, key: str):
+        self.client = client
+        self.key = key
+
+    def acquire(self, holder: str, lease_secs: float) -> bool:
+        lease_ms = int(lease_secs * 1000)
+        if self.client.set(self.key, holder, nx=True, px=lease_ms):
+            return True
+        return bool(self.client.eval(self.RENEW_SCRIPT, 1, self.key, holder, lease_ms))
+
+    def release(self, holder: str):
+        self.client.eval(self.RELEASE_SCRIPT, 1, self.key, holder)
+
+
+class LeaderElector:
+    """
+    Keeps trying to take or renew the lease, every third of its duration
+    (on_lost is called when the lease is lost)
+    """
+    def __init__(self, lease, lease_secs: float, on_lost=None):
+        self.lease = lease
+        self.lease_secs = lease_secs
+        self.on_lost = on_lost
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def is_leader(self) -> bool:
+        return self._leader.is_set()
+
+    def wait_for_leadership(self, timeout: float) -> bool:
+        return self._leader.wait(timeout)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="leader_elector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops renewing and gives the lease away
+        """
+        self._stopped.set()
+        if self._leader.is_set():
+            self._leader.clear()
+            try:
+                self.lease.release(self.holder)
+            except Exception as error:
+                logger.warning("HA - Lease can't be released - %s", error)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            renew_started = time.monotonic()
+            try:
+                leader = self.lease.acquire(self.holder, self.lease_secs)
+            except Exception as error:
+                logger.error("HA - Lease can't be renewed - %s", error)
+                leader = False
+            # The lease is only trusted while it can't have expired
+            if leader and time.monotonic() - renew_started < self.lease_secs / 2:
+                if not self._leader.is_set():
+                    logger.info("HA - %s is now the active instance", self.holder)
+                    self._leader.set()
+            elif self._leader.is_set():
+                logger.warning("HA - %s lost the lease : standing by", self.holder)
+                self._leader.clear()
+                if self.on_lost is not None:
+                    self.on_lost()
+            self._stopped.wait(self.lease_secs / 3)
@@ -0,0 +1,202 @@
+"""
+language_doorkeeper_outcomes.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+Compact, append-only store of the tests outcomes,
+and a command line tool to analyze it.
+
+Usage (from /root/hll_rcon_tool) :
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_outcomes summary
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_outcomes hourly --days 7
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import argparse
+import os
+import struct
+import threading
+from datetime import datetime, timezone
+
+
+# Outcomes codes (never reorder : only append new ones)
+OUTCOMES = ("valid", "kick", "coward", "ghost", "cancelled", "chat", "spared", "timeout")
+
+# One record per test (little-endian, 86 bytes) :
+# start timestamp, end timestamp, player_id, expected word,
+# outcome code, punish attempts, answering time (secs)
+RECORD_STRUCT = struct.Struct("<dd32s32sBBf")
+RECORD_FIELDS = (
+    ("started", "<f8"),
+    ("ended", "<f8"),
+    ("player_id", "S32"),
+    ("word", "S32"),
+    ("outcome", "u1"),
+    ("punish_attempts", "u1"),
+    ("answer_secs", "<f4"),
+)
+
+
+def outcomes_file_path(data_dir: str, server_number) -> str:
+    """
+    Returns the outcomes file path for a game server
+    """
+    return os.path.join(data_dir, f"language_doorkeeper_outcomes_{server_number}.bin")
+
+
+class OutcomeStore:
+    """
+    Appends the tests outcomes to a binary file, one fixed size record per test
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(
+        self,
+        outcome: str,
+        player_id: str,
+        word: str,
+        started: float,
+        ended: float,
+        punish_attempts: int = 0,
+        answer_secs: float = 0
+    ):
+        """
+        Appends an outcome record
+        """
+        record = RECORD_STRUCT.pack(
+            started,
+            ended,
+            player_id.encode("utf-8")[:32],
+            word.encode("utf-8")[:32],
+            OUTCOMES.index(outcome),
+            min(max(punish_attempts, 0), 255),
+            answer_secs
+        )
+        with self._lock:
+            with open(self.path, "ab") as file:
+                file.write(record)
+
+
+def load_records(path: str):
+    """
+    Memory-maps the outcomes file as a NumPy structured array
+    (an incomplete last record, from an interrupted write, is ignored)
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    dtype = np.dtype(list(RECORD_FIELDS))
+    count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def summary(records):
+    """
+    Prints the outcomes distribution, answering times and punish attempts
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    total = len(records)
+    print(
+        f"{total} tests from "
+        f"{datetime.fromtimestamp(records['started'].min(), timezone.utc):%Y-%m-%d %H:%M} to "
+        f"{datetime.fromtimestamp(records['ended'].max(), timezone.utc):%Y-%m-%d %H:%M} UTC\n"
+    )
+
+    counts = np.bincount(records["outcome"], minlength=len(OUTCOMES))
+    print("Outcomes")
+    for code, name in enumerate(OUTCOMES):
+        print(f"  {name:<10} {counts[code]:>10}  {100 * counts[code] / total:6.2f} %")
+
+    percentiles = (50, 75, 90, 95, 99)
+    valid = records["answer_secs"][records["outcome"] == OUTCOMES.index("valid")]
+    if len(valid):
+        values = np.percentile(valid, percentiles)
+        print("\nValid answers time (secs)")
+        for percentile, value in zip(percentiles, values):
+            print(f"  p{percentile:<9} {value:>10.1f}")
+        print(f"  max        {valid.max():>10.1f}")
+
+    punished = records["punish_attempts"][records["punish_attempts"] > 0]
+    if len(punished):
+        attempts = np.bincount(punished)
+        print("\nPunish attempts before the question was seen")
+        for count in range(1, len(attempts)):
+            share = 100 * attempts[count] / len(punished)
+            print(f"  {count:<10} {attempts[count]:>10}  {share:6.2f} %")
+
+    durations = records["ended"] - records["started"]
+    values = np.percentile(durations, percentiles)
+    print("\nTest total duration (secs)")
+    for percentile, value in zip(percentiles, values):
+        print(f"  p{percentile:<9} {value:>10.1f}")
+
+
+def hourly(records):
+    """
+    Prints the tests and kicks per hour, by hour of the day (UTC)
+    """
+    import numpy as np  # pylint: disable=import-outside-toplevel
+
+    hours = (records["started"] // 3600).astype(np.int64)
+    first_hour = hours.min()
+    buckets = hours - first_hour
+    nb_buckets = buckets.max() + 1
+    tests = np.bincount(buckets, minlength=nb_buckets)
+    kicks = np.bincount(
+        buckets[records["outcome"] == OUTCOMES.index("kick")], minlength=nb_buckets
+    )
+    hour_of_day = (np.arange(nb_buckets) + first_hour) % 24
+
+    # Only the hours where the plugin was active are taken in account
+    active = tests > 0
+    print("Hour (UTC)   tests/h (avg)   kicks/h (avg)   kicks/h (max)")
+    for hour in range(24):
+        selected = active & (hour_of_day == hour)
+        if not selected.any():
+            continue
+        print(
+            f"  {hour:02d}h        {tests[selected].mean():>10.1f}"
+            f"      {kicks[selected].mean():>10.1f}      {kicks[selected].max():>10}"
+        )
+
+
+def main():
+    """
+    Command line tool
+    """
+    # pylint: disable=import-outside-toplevel
+    from rcon.utils import get_server_number
+    import custom_tools.language_doorkeeper_config as config
+
+    parser = argparse.ArgumentParser(description="language_doorkeeper tests outcomes analysis")
+    parser.add_argument("report", choices=("summary", "hourly"))
+    parser.add_argument("--file", help="outcomes file (default : this server's one)")
+    parser.add_argument("--days", type=float, help="only analyze the last X days")
+    args = parser.parse_args()
+
+    records = load_records(
+        args.file or outcomes_file_path(config.DATA_DIR, get_server_number())
+    )
+    if args.days is not None:
+        min_timestamp = datetime.now(timezone.utc).timestamp() - args.days * 86400
+        records = records[records["started"] >= min_timestamp]
+    if len(records) == 0:
+        print("No test recorded")
+        return
+
+    if args.report == "summary":
+        summary(records)
+    else:
+        hourly(records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+language_doorkeeper_profiling.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+On-demand profiling of the running plugin, triggered by signals :
+- SIGUSR1 : threads stacks dump and memory snapshot (tracemalloc)
+- SIGUSR2 : sampling CPU profile (collapsed stacks, for flame graphs)
+  Only the threads that used CPU time since the previous sample are counted
+  (Linux : /proc/self/task). Elsewhere, all the threads are (wall-clock profile).
+
+The files are written in DATA_DIR/language_doorkeeper_profiles.
+
+Compare two memory snapshots (from /root/hll_rcon_tool) :
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_profiling compare \\
+    /logs/language_doorkeeper_profiles/1_memory_20250101_120000.tracemalloc \\
+    /logs/language_doorkeeper_profiles/1_memory_20250102_120000.tracemalloc
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+
+# Frames kept by tracemalloc for each allocation
+TRACEMALLOC_FRAMES = 10
+
+# Lines written in the memory reports
+MEMORY_REPORT_LINES = 50
+
+
+logger = logging.getLogger('rcon')
+
+
+def thread_cpu_ticks(native_id: int) -> Optional[int]:
+    """
+    Returns the CPU time (clock ticks) used by a thread,
+    or None if it can't be read
+    """
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", encoding="ascii") as file:
+            # The fields after the command name : state, ppid, ..., utime (12th), stime (13th)
+            fields = file.read().rsplit(")", 1)[1].split()
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def compare_snapshots(old: tracemalloc.Snapshot, new: tracemalloc.Snapshot, limit: int) -> str:
+    """
+    Returns the memory allocations that grew the most between two snapshots
+    """
+    stats = new.compare_to(old, "lineno")
+    total = sum(stat.size_diff for stat in stats)
+    lines = [f"Total : {total / 1024:+.1f} KiB"]
+    lines.extend(str(stat) for stat in stats[:limit])
+    return "\n".join(lines)
+
+
+class Profiler:
+    """
+    Writes the profiling reports of this process
+    """
+    def __init__(self, directory: str, prefix: str):
+        self.directory = directory
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._first_snapshot = None
+        self._last_snapshot = None
+        self._cpu_thread = None
+
+    def _path(self, kind: str, extension: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(
+            self.directory,
+            f"{self.prefix}_{kind}_{datetime.now():%Y%m%d_%H%M%S}.{extension}"
+        )
+
+    def dump_threads(self) -> str:
+        """
+        Writes the stack of every thread
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        path = self._path("threads", "txt")
+        with open(path, "w", encoding="utf-8") as file:
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            file.write(f"{len(frames)} threads\n")
+            for ident, frame in frames.items():
+                file.write(f"\n--- {names.get(ident, '?')} ({ident}) ---\n")
+                file.write("".join(traceback.format_stack(frame)))
+        logger.info("Profiling - Threads stacks written to %s", path)
+        return path
+
+    def memory_snapshot(self) -> str:
+        """
+        Writes a memory snapshot and its differences with the previous and the first ones.
+        The first call only starts tracing the allocations.
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                logger.info("Profiling - Memory allocations tracing started")
+                return ""
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+            ))
+            path = self._path("memory", "tracemalloc")
+            snapshot.dump(path)
+
+            current, peak = tracemalloc.get_traced_memory()
+            report = [
+                f"Traced memory : {current / 1024:.1f} KiB (peak : {peak / 1024:.1f} KiB)",
+                "",
+                "--- Top allocations ---",
+            ]
+            report.extend(
+                str(stat) for stat in snapshot.statistics("lineno")[:MEMORY_REPORT_LINES]
+            )
+            if self._last_snapshot is not None:
+                report += ["", "--- Since the previous snapshot ---"]
+                report.append(compare_snapshots(
+                    self._last_snapshot, snapshot, MEMORY_REPORT_LINES
+                ))
+            if self._first_snapshot is not None:
+                report += ["", "--- Since the first snapshot ---"]
+                report.append(compare_snapshots(
+                    self._first_snapshot, snapshot, MEMORY_REPORT_LINES
+                ))
+            with open(path[:-len(".tracemalloc")] + ".txt", "w", encoding="utf-8") as file:
+                file.write("\n".join(report) + "\n")
+
+            self._first_snapshot = self._first_snapshot or snapshot
+            self._last_snapshot = snapshot
+        logger.info("Profiling - Memory snapshot written to %s", path)
+        return path
+
+    def start_cpu_profile(self, duration_secs: float, interval_secs: float) -> bool:
+        """
+        Starts a sampling CPU profile in the background,
+        unless one is already running
+        """
+        with self._lock:
+            if self._cpu_thread is not None and self._cpu_thread.is_alive():
+                logger.warning("Profiling - A CPU profile is already running")
+                return False
+            self._cpu_thread = threading.Thread(
+                target=self.cpu_profile,
+                args=(duration_secs, interval_secs),
+                name="profiler",
+                daemon=True
+            )
+            self._cpu_thread.start()
+        return True
+
+    def cpu_profile(self, duration_secs: float, interval_secs: float) -> str:
+        """
+        Samples the stacks of all the other threads during duration_secs,
+        and writes them in the "collapsed" format (one "stack count" per line)
+        Each stack is counted for the CPU ticks its thread used since the previous sample
+        (idle threads are left out), or once per sample if it can't be known (wall-clock).
+        """
+        own_ident = threading.get_ident()
+        wall_clock = thread_cpu_ticks(threading.get_native_id()) is None
+        kind = "wall" if wall_clock else "cpu"
+        logger.info(
+            "Profiling - %s profile started (%s secs)",
+            "Wall-clock" if wall_clock else "CPU", duration_secs
+        )
+        stacks = Counter()
+        last_ticks = {}
+        samples = 0
+        end = time.monotonic() + duration_secs
+        while time.monotonic() < end:
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            names = {ident: thread.name for ident, thread in threads.items()}
+            for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if ident == own_ident:
+                    continue
+                weight = 1
+                if not wall_clock:
+                    if ident not in threads:
+                        continue
+                    ticks = thread_cpu_ticks(threads[ident].native_id)
+                    previous = last_ticks.get(ident)
+                    last_ticks[ident] = ticks
+                    if ticks is None or previous is None:
+                        continue
+                    weight = ticks - previous
+                    if weight <= 0:
+                        continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                    )
+                    frame = frame.f_back
+                calls.append(names.get(ident, "?"))
+                stacks[";".join(reversed(calls))] += weight
+            samples += 1
+            time.sleep(interval_secs)
+
+        path = self._path(kind, "collapsed")
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        # Functions on top of the stacks
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        logger.info(
+            "Profiling - %s profile written to %s - %s samples - top : %s",
+            "Wall-clock" if wall_clock else "CPU",
+            path,
+            samples,
+            " ; ".join(f"{leaf} x{count}" for leaf, count in leaves.most_common(5))
+        )
+        return path
+
+
+def main():
+    """
+    Command line tool
+    """
+    parser = argparse.ArgumentParser(description="language_doorkeeper memory snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare = subparsers.add_parser("compare", help="compare two memory snapshots")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--limit", type=int, default=MEMORY_REPORT_LINES)
+    args = parser.parse_args()
+
+    print(compare_snapshots(
+        tracemalloc.Snapshot.load(args.old), tracemalloc.Snapshot.load(args.new), args.limit
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+language_doorkeeper_shared_ids.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+Players outcomes shared by all the game servers plugins of a host,
+in a memory-mapped hash table (a file in the shared /logs volume).
+
+- reads are lock-free : the writer increments a sequence number
+  before and after each change, readers retry if it changed (seqlock)
+- writes are serialized between processes by a file lock (flock)
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+from custom_tools.language_doorkeeper_outcomes import OUTCOMES
+
+
+MAGIC = b"LDSIDS01"
+
+# magic, sequence number, slots count, used slots
+HEADER_STRUCT = struct.Struct("<8sQQQ")
+SEQUENCE_OFFSET = 8
+COUNT_OFFSET = 24
+
+# player_id hash (0 : empty slot), timestamp (secs), outcome code
+SLOT_STRUCT = struct.Struct("<QIB3x")
+
+# The oldest half of the entries is dropped above this load factor
+MAX_LOAD = 0.75
+
+# Reads attempted while the table is being written, before giving up
+# (a writer killed while writing leaves the sequence number odd)
+MAX_READ_RETRIES = 1000
+
+
+def shared_ids_file_path(data_dir: str) -> str:
+    """
+    Returns the shared file path (the same for all the game servers)
+    """
+    return os.path.join(data_dir, "language_doorkeeper_shared_ids.bin")
+
+
+def player_id_hash(player_id: str) -> int:
+    """
+    64 bits hash of a player_id (never 0)
+    """
+    digest = hashlib.blake2b(player_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedIdSet:
+    """
+    Last outcome of each player, shared between processes
+    """
+    def __init__(self, path: str, capacity: int):
+        self.path = path
+        # Open addressing needs a power of 2 slots count
+        self.capacity = 1 << max(capacity - 1, 1).bit_length()
+        self._thread_lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        """
+        Maps the file, creating it if needed
+        """
+        if self._map is not None:
+            return
+        with self._thread_lock:
+            if self._map is not None:
+                return
+            # pylint: disable-next=consider-using-with
+            file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                header = file.read(HEADER_STRUCT.size)
+                valid = len(header) == HEADER_STRUCT.size and header[:8] == MAGIC
+                if valid:
+                    capacity = HEADER_STRUCT.unpack(header)[2]
+                    valid = (
+                        os.fstat(file.fileno()).st_size
+                        == HEADER_STRUCT.size + capacity * SLOT_STRUCT.size
+                    )
+                if valid:
+                    self.capacity = capacity
+                else:
+                    file.truncate(0)
+                    file.truncate(HEADER_STRUCT.size + self.capacity * SLOT_STRUCT.size)
+                    file.seek(0)
+                    file.write(HEADER_STRUCT.pack(MAGIC, 0, self.capacity, 0))
+                    file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            self._map = mmap.mmap(file.fileno(), 0)
+            self._file = file
+
+    def _read_u64(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self._map, offset)[0]
+
+    def _find(self, key: int) -> Tuple[int, Optional[tuple]]:
+        """
+        Returns the key slot index and content, or the empty slot where it would go
+        """
+        mask = self.capacity - 1
+        index = key & mask
+        for _ in range(self.capacity):
+            slot = SLOT_STRUCT.unpack_from(
+                self._map, HEADER_STRUCT.size + index * SLOT_STRUCT.size
+            )
+            if slot[0] == key:
+                return index, slot
+            if slot[0] == 0:
+                return index, None
+            index = (index + 1) & mask
+        return -1, None
+
+    def get(self, player_id: str) -> Optional[Tuple[str, int]]:
+        """
+        Returns the player's last (outcome, timestamp),
+        or None if unknown (or unreadable after MAX_READ_RETRIES)
+        """
+        self._open()
+        key = player_id_hash(player_id)
+        for _ in range(MAX_READ_RETRIES):
+            sequence = self._read_u64(SEQUENCE_OFFSET)
+            if sequence & 1:
+                # Being written
+                time.sleep(0)
+                continue
+            _, slot = self._find(key)
+            if self._read_u64(SEQUENCE_OFFSET) == sequence:
+                break
+        else:
+            return None
+        if slot is None:
+            return None
+        return OUTCOMES[slot[2]], slot[1]
+
+    def put(self, player_id: str, outcome: str):
+        """
+        Records the player's last outcome
+        """
+        self._open()
+        key = player_id_hash(player_id)
+        record = (key, int(time.time()), OUTCOMES.index(outcome))
+        with self._thread_lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            sequence = self._read_u64(SEQUENCE_OFFSET)
+            # Left odd by a writer killed while writing
+            sequence += sequence & 1
+            struct.pack_into("<Q", self._map, SEQUENCE_OFFSET, sequence + 1)
+            try:
+                index, slot = self._find(key)
+                if slot is None:
+                    count = self._read_u64(COUNT_OFFSET)
+                    if count + 1 > self.capacity * MAX_LOAD:
+                        self._compact()
+                        index, slot = self._find(key)
+                        count = self._read_u64(COUNT_OFFSET)
+                    struct.pack_into("<Q", self._map, COUNT_OFFSET, count + 1)
+                SLOT_STRUCT.pack_into(
+                    self._map, HEADER_STRUCT.size + index * SLOT_STRUCT.size, *record
+                )
+            finally:
+                struct.pack_into("<Q", self._map, SEQUENCE_OFFSET, sequence + 2)
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _compact(self):
+        """
+        Drops the oldest half of the entries (must be called while writing)
+        """
+        slots = [
+            SLOT_STRUCT.unpack_from(self._map, HEADER_STRUCT.size + index * SLOT_STRUCT.size)
+            for index in range(self.capacity)
+        ]
+        kept = sorted((slot for slot in slots if slot[0]), key=lambda slot: slot[1])
+        kept = kept[len(kept) // 2:]
+        self._map[HEADER_STRUCT.size:] = bytes(self.capacity * SLOT_STRUCT.size)
+        for slot in kept:
+            index, _ = self._find(slot[0])
+            SLOT_STRUCT.pack_into(
+                self._map, HEADER_STRUCT.size + index * SLOT_STRUCT.size, *slot
+            )
+        struct.pack_into("<Q", self._map, COUNT_OFFSET, len(kept))
@@ -0,0 +1,231 @@
+"""
+language_doorkeeper_steam.py
+
+A plugin for HLL CRCON (https://github.com/MarechJ/hll_rcon_tool)
+that filters (kick) players based upon their language.
+
+Resolves the Steam profiles countries missing in CRCON profiles
+(Steam Web API GetPlayerSummaries).
+
+Check the resolver against a local stand-in of the Steam API (from /root/hll_rcon_tool) :
+docker compose exec backend_1 python -m custom_tools.language_doorkeeper_steam check
+
+Source : https://github.com/ElGuillermo
+
+Feel free to use/modify/distribute, as long as you keep this note in your code
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import List
+
+
+# Maximum number of Steam ids per GetPlayerSummaries request
+STEAM_SUMMARIES_MAX_IDS = 100
+
+
+logger = logging.getLogger('rcon')
+
+
+class SteamCountryResolver:
+    """
+    Resolves the Steam profiles countries missing in CRCON profiles,
+    in batches of STEAM_SUMMARIES_MAX_IDS, the results being saved to a JSON file.
+    Private profiles (no country) are cached too.
+    - config : STEAM_API_KEY, STEAM_API_URL and STEAM_COUNTRY_CACHE_HOURS values
+    - call(func, *args) : runs a Steam API request
+    - save(path, data, label) : writes the JSON file
+    """
+    def __init__(self, path: str, config, call, save):
+        self.path = path
+        self.config = config
+        self.call = call
+        self.save = save
+        self._lock = threading.Lock()
+        self._countries = {}
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                self._countries = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as error:
+            logger.error("Steam countries - Can't read '%s' - %s", self.path, error)
+
+    def _api_key(self) -> str:
+        if self.config.STEAM_API_KEY:
+            return self.config.STEAM_API_KEY
+        try:
+            # pylint: disable=import-outside-toplevel
+            from rcon.user_config.steam import SteamUserConfig
+            return SteamUserConfig.load_from_db().api_key or ""
+        except Exception as error:
+            logger.warning("Steam countries - No Steam API key - %s", error)
+            return ""
+
+    def _fetch(self, api_key: str, steam_ids: List[str]) -> dict:
+        """
+        One GetPlayerSummaries request
+        """
+        url = self.config.STEAM_API_URL + "?" + urllib.parse.urlencode(
+            {"key": api_key, "steamids": ",".join(steam_ids)}
+        )
+        with urllib.request.urlopen(url, timeout=10) as response:
+            players = json.load(response)["response"]["players"]
+        countries = dict.fromkeys(steam_ids)
+        for player in players:
+            countries[player["steamid"]] = player.get("loccountrycode")
+        return countries
+
+    def resolve(self, player_ids: List[str]) -> dict:
+        """
+        Returns the known countries (or None) of the players
+        """
+        now = time.time()
+        ttl = self.config.STEAM_COUNTRY_CACHE_HOURS * 3600
+        with self._lock:
+            cached = {
+                player_id: self._countries[player_id]["country"]
+                for player_id in player_ids
+                if player_id in self._countries
+                and now - self._countries[player_id]["at"] <= ttl
+            }
+        # Only Steam players have a Steam profile
+        missing = [
+            player_id for player_id in player_ids
+            if player_id not in cached and player_id.isdigit() and len(player_id) == 17
+        ]
+        if not missing:
+            return cached
+        api_key = self._api_key()
+        if not api_key:
+            return cached
+
+        resolved = {}
+        for index in range(0, len(missing), STEAM_SUMMARIES_MAX_IDS):
+            try:
+                resolved.update(self.call(
+                    self._fetch, api_key, missing[index:index + STEAM_SUMMARIES_MAX_IDS]
+                ))
+            except Exception as error:
+                logger.warning("Steam countries - Request failed - %s", error)
+                break
+        if resolved:
+            logger.info(
+                "Steam countries - %s profile(s) resolved - %s with a country",
+                len(resolved), sum(country is not None for country in resolved.values())
+            )
+            with self._lock:
+                for player_id, country in resolved.items():
+                    self._countries[player_id] = {"country": country, "at": now}
+                self._countries = {
+                    player_id: entry for player_id, entry in self._countries.items()
+                    if now - entry["at"] <= ttl
+                }
+                self.save(self.path, self._countries, "Steam countries")
+        return {**cached, **resolved}
+
+
+def check() -> bool:
+    """
+    Runs the resolver against a local stand-in of the Steam API :
+    batches of STEAM_SUMMARIES_MAX_IDS, private profiles cache,
+    cache expiry and non-Steam ids
+    """
+    requests = []
+
+    class StandIn(BaseHTTPRequestHandler):
+        """
+        GetPlayerSummaries : even ids are french, odd ids are private
+        """
+        def do_GET(self):  # pylint: disable=invalid-name
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            steam_ids = query["steamids"][0].split(",")
+            requests.append(steam_ids)
+            players = [{"steamid": steam_id} for steam_id in steam_ids]
+            for player in players:
+                if int(player["steamid"]) % 2 == 0:
+                    player["loccountrycode"] = "FR"
+            body = json.dumps({"response": {"players": players}}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
+
+    def save(path: str, data, label: str):  # pylint: disable=unused-argument
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, name="steam_stand_in", daemon=True).start()
+    config = SimpleNamespace(
+        STEAM_API_KEY="check",
+        STEAM_API_URL=f"http://127.0.0.1:{server.server_port}/",
+        STEAM_COUNTRY_CACHE_HOURS=1
+    )
+    steam_ids = [str(76561190000000000 + index) for index in range(250)]
+    other_ids = ["0a1b2c3d4e5f60718293a4b5c6d7e8f9", "7656119"]
+    results = []
+
+    def expect(name: str, condition: bool):
+        results.append(condition)
+        print(f"{'OK  ' if condition else 'FAIL'} {name}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "steam_countries.json")
+        resolver = SteamCountryResolver(path, config, lambda func, *args: func(*args), save)
+
+        countries = resolver.resolve(steam_ids + other_ids)
+        expect("250 ids in 3 requests", [len(ids) for ids in requests] == [100, 100, 50])
+        expect("non-Steam ids not requested", not set(other_ids) & set(sum(requests, [])))
+        expect(
+            "countries and private profiles",
+            countries[steam_ids[0]] == "FR" and countries[steam_ids[1]] is None
+            and len(countries) == len(steam_ids)
+        )
+
+        requests.clear()
+        countries = resolver.resolve(steam_ids + other_ids)
+        expect("private profiles cached", not requests and countries[steam_ids[1]] is None)
+
+        requests.clear()
+        reloaded = SteamCountryResolver(path, config, lambda func, *args: func(*args), save)
+        reloaded.resolve(steam_ids)
+        expect("cache reloaded from the file", not requests)
+
+        requests.clear()
+        for entry in reloaded._countries.values():  # pylint: disable=protected-access
+            entry["at"] -= 2 * 3600
+        reloaded.resolve(steam_ids[:10])
+        expect("expired entries requested again", requests == [steam_ids[:10]])
+
+    server.shutdown()
+    return all(results)
+
+
+def main():
+    """
+    Command line tool
+    """
+    parser = argparse.ArgumentParser(description="language_doorkeeper Steam countries")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check", help="check the resolver against a local Steam API stand-in")
+    parser.parse_args()
+
+    sys.exit(0 if check() else 1)
+
+
+if __name__ == "__main__":
+    main()